@@ -293,6 +293,7 @@ if (-not $WhatIf) {
 
     $uninstallerFiles = @(
         @{File="uninstall.py"; Url="https://raw.githubusercontent.com/justmy2satoshis/mcp-federation-core/main/installers/unified/uninstall.py"},
+        @{File="json_utils.py"; Url="https://raw.githubusercontent.com/justmy2satoshis/mcp-federation-core/main/installers/unified/json_utils.py"},
         @{File="uninstall.bat"; Url="https://raw.githubusercontent.com/justmy2satoshis/mcp-federation-core/main/installers/unified/uninstall.bat"},
         @{File="uninstall.sh"; Url="https://raw.githubusercontent.com/justmy2satoshis/mcp-federation-core/main/installers/unified/uninstall.sh"}
     )
@@ -5,17 +5,117 @@ Fixes critical database path issues and eliminates hardcoded paths
 """
 
 import os
+import re
 import sys
 import json
-import sqlite3
 import shutil
 import platform
-import subprocess
+import functools
+from collections import deque
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import logging
 
+from json_utils import dumps_json, iter_top_level_members
+
+# MCP server definitions, kept as JSON text so generate_mcp_configs can
+# substitute placeholders in one regex pass and parse the result once.
+# CRITICAL FIX: SQLite MCP must point to unified database
+_CONFIG_TEMPLATE_JSON = """
+{
+  "sqlite-data-warehouse": {
+    "command": "[NODE_EXEC]",
+    "args": ["[REPO_ROOT]/mcps/sqlite/server.js", "[INSTALL_PATH]/mcp-unified.db"],
+    "env": {"NODE_NO_WARNINGS": "1"}
+  },
+  "expert-role-prompt": {
+    "command": "[NODE_EXEC]",
+    "args": ["[REPO_ROOT]/mcps/expert-role-prompt/server.js"]
+  },
+  "kimi-k2-resilient": {
+    "command": "[PYTHON_EXEC]",
+    "args": ["[REPO_ROOT]/mcps/kimi-k2-resilient-enhanced/server.py"]
+  },
+  "kimi-k2-code-context": {
+    "command": "[PYTHON_EXEC]",
+    "args": ["[REPO_ROOT]/mcps/kimi-k2-code-context-enhanced/server.py"]
+  },
+  "converse-enhanced": {
+    "command": "[PYTHON_EXEC]",
+    "args": ["[REPO_ROOT]/mcps/converse-enhanced/server.py"]
+  },
+  "filesystem": {
+    "command": "[NODE_EXEC]",
+    "args": [
+      "[REPO_ROOT]/node_modules/@modelcontextprotocol/server-filesystem/dist/index.js",
+      "[HOME]/Documents"
+    ]
+  },
+  "memory": {
+    "command": "[NODE_EXEC]",
+    "args": ["[REPO_ROOT]/node_modules/@modelcontextprotocol/server-memory/dist/index.js"]
+  },
+  "sequential-thinking": {
+    "command": "[NODE_EXEC]",
+    "args": ["[REPO_ROOT]/node_modules/@modelcontextprotocol/server-sequential-thinking/dist/index.js"]
+  },
+  "desktop-commander": {
+    "command": "[NODE_EXEC]",
+    "args": ["[REPO_ROOT]/node_modules/@wonderwhy-er/desktop-commander/dist/index.js"]
+  },
+  "playwright": {
+    "command": "[NODE_EXEC]",
+    "args": ["[REPO_ROOT]/node_modules/@playwright/mcp/dist/index.js"],
+    "env": {"PLAYWRIGHT_BROWSER": "chromium"}
+  },
+  "git-ops": {
+    "command": "[NODE_EXEC]",
+    "args": ["[REPO_ROOT]/node_modules/@cyanheads/git-mcp-server/dist/index.js"],
+    "env": {"GIT_REPO_PATH": "[REPO_ROOT]"}
+  }
+}
+"""
+
+def _merge_mcp_servers(text: str, mcp_configs: Dict[str, dict]) -> str:
+    """Merge mcp_configs into the mcpServers section of an existing config.
+
+    Only mcpServers is re-serialized; every other top-level value is validated
+    by the decoder and then copied through verbatim from the original text.
+    """
+    entries = {}  # key -> original value text (None for mcpServers)
+    mcp_servers = {}
+    for key, value, start, end in iter_top_level_members(text):
+        if key == 'mcpServers':
+            mcp_servers = value
+            entries[key] = None
+        else:
+            entries[key] = text[start:end]
+
+    # Add our MCP configurations
+    mcp_servers.update(mcp_configs)
+    entries['mcpServers'] = None
+    servers_json = dumps_json(mcp_servers).decode('utf-8').replace('\n', '\n  ')
+
+    members = [
+        f'  {json.dumps(key)}: {servers_json if value is None else value}'
+        for key, value in entries.items()
+    ]
+    return '{\n' + ',\n'.join(members) + '\n}'
+
 class MCPInstaller:
+    # Placeholders understood by resolve_all_paths, matched in a single regex pass
+    PLACEHOLDERS = (
+        '[INSTALL_PATH]', '[USERNAME]', '[HOME]', '[PYTHON_EXEC]',
+        '[NODE_EXEC]', '[REPO_ROOT]', '$RepoRoot', '$Username'
+    )
+    _PLACEHOLDER_RE = re.compile('|'.join(map(re.escape, PLACEHOLDERS)))
+
+    # Attributes that feed the generated configs; reassigning one drops the cache
+    _CONFIG_INPUTS = frozenset({
+        'platform', 'home_dir', 'username', 'repo_root',
+        'mcp_base', 'python_exec', 'node_exec'
+    })
+
     def __init__(self):
         self.platform = platform.system().lower()
         self.home_dir = Path.home()
@@ -37,12 +137,22 @@ class MCPInstaller:
         logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
         self.logger = logging.getLogger(__name__)
 
-    def _find_repo_root(self) -> Path:
-        """Find repository root by looking for .git directory"""
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self._CONFIG_INPUTS:
+            self.__dict__.pop('mcp_configs', None)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _find_repo_root() -> Path:
+        """Find repository root by looking for .git directory (cached per process)"""
         current = Path(__file__).parent
         while current != current.parent:
-            if (current / '.git').exists():
+            try:
+                os.stat(os.path.join(str(current), '.git'))
                 return current
+            except FileNotFoundError:
+                pass
             current = current.parent
 
         # Fallback to script location
@@ -50,36 +160,33 @@ class MCPInstaller:
 
     def _get_config_paths(self) -> Dict[str, Path]:
         """Get platform-specific configuration paths"""
+        # Join plain strings and wrap each result in a Path once
+        home = os.fspath(self.home_dir)
+        join = os.path.join
+
         if self.platform == 'windows':
-            appdata = Path(os.getenv('APPDATA', self.home_dir / 'AppData' / 'Roaming'))
-            return {
-                'claude_desktop': appdata / 'Claude' / 'claude_desktop_config.json',
-                'claude_code': self.home_dir / '.claude' / 'claude_code_config.json'
-            }
+            config_dir = os.getenv('APPDATA') or join(home, 'AppData', 'Roaming')
         elif self.platform == 'darwin':  # macOS
-            return {
-                'claude_desktop': self.home_dir / 'Library' / 'Application Support' / 'Claude' / 'claude_desktop_config.json',
-                'claude_code': self.home_dir / '.claude' / 'claude_code_config.json'
-            }
+            config_dir = join(home, 'Library', 'Application Support')
         else:  # Linux
-            config_dir = Path(os.getenv('XDG_CONFIG_HOME', self.home_dir / '.config'))
-            return {
-                'claude_desktop': config_dir / 'Claude' / 'claude_desktop_config.json',
-                'claude_code': self.home_dir / '.claude' / 'claude_code_config.json'
-            }
+            config_dir = os.getenv('XDG_CONFIG_HOME') or join(home, '.config')
+
+        return {
+            'claude_desktop': Path(join(config_dir, 'Claude', 'claude_desktop_config.json')),
+            'claude_code': Path(join(home, '.claude', 'claude_code_config.json'))
+        }
 
     def detect_claude_installations(self) -> List[str]:
         """Detect which Claude applications are installed"""
         installed = []
 
-        # Check for Claude Desktop
-        for config_path in self.config_paths.values():
-            if config_path.parent.exists():
-                installed.append('claude_desktop')
-                break
+        # An app counts as installed when its config directory exists
+        for app, config_path in self.config_paths.items():
+            if os.path.isdir(config_path.parent):
+                installed.append(app)
 
-        # Check for Claude Code CLI
-        if shutil.which('claude'):
+        # Check for Claude Code CLI (skip the PATH scan if already found)
+        if 'claude_code' not in installed and shutil.which('claude'):
             installed.append('claude_code')
 
         return installed
@@ -104,120 +211,100 @@ class MCPInstaller:
 
     def create_directory_structure(self):
         """Create required directories"""
-        directories = [
-            self.mcp_base,
-            self.mcp_base / 'databases',
-            self.mcp_base / 'servers',
-            self.mcp_base / 'logs',
-            self.mcp_base / 'backups'
-        ]
-
-        for directory in directories:
-            directory.mkdir(parents=True, exist_ok=True)
-            self.logger.info(f"Created directory: {directory}")
+        # Only the base may need its parents created; the leaves sit directly under it
+        os.makedirs(self.mcp_base, exist_ok=True)
+        self.logger.info("Created directory: %s", self.mcp_base)
+
+        base = os.fspath(self.mcp_base)
+        for leaf in ('databases', 'servers', 'logs', 'backups'):
+            directory = os.path.join(base, leaf)
+            try:
+                os.mkdir(directory)
+            except FileExistsError:
+                pass
+            self.logger.info("Created directory: %s", directory)
+
+    def _get_placeholder_map(self) -> Dict[str, str]:
+        """Map every known placeholder to its value for the current paths"""
+        # Convert each Path to a string once; the template does all joining
+        repo = os.fspath(self.repo_root)
+        return {
+            '[INSTALL_PATH]': os.fspath(self.mcp_base),
+            '[USERNAME]': self.username,
+            '[HOME]': os.fspath(self.home_dir),
+            '[PYTHON_EXEC]': self.python_exec,
+            '[NODE_EXEC]': self.node_exec or 'node',
+            '[REPO_ROOT]': repo,
+            '$RepoRoot': repo,
+            '$Username': self.username
+        }
+
+    def _fix_separators(self, value: str) -> str:
+        """Platform-specific path fixes"""
+        if self.platform == 'windows':
+            return value.replace('/', '\\')
+        return value.replace('\\', '/')
+
+    def _resolve_str(self, value: str, replacements: Dict[str, str]) -> str:
+        """Replace placeholders in a single string and fix path separators"""
+        result, count = self._PLACEHOLDER_RE.subn(lambda m: replacements[m.group(0)], value)
+
+        # Only strings built from our paths are normalized; plain values
+        # such as flags or URLs are passed through untouched
+        return self._fix_separators(result) if count else result
 
     def resolve_all_paths(self, config: dict) -> dict:
         """Replace ALL placeholders in configuration with actual paths"""
-        if isinstance(config, dict):
-            resolved = {}
-            for key, value in config.items():
-                resolved[key] = self.resolve_all_paths(value)
-            return resolved
-        elif isinstance(config, list):
-            return [self.resolve_all_paths(item) for item in config]
-        elif isinstance(config, str):
-            # Replace all known placeholders
-            replacements = {
-                '[INSTALL_PATH]': str(self.mcp_base),
-                '[USERNAME]': self.username,
-                '[HOME]': str(self.home_dir),
-                '[PYTHON_EXEC]': self.python_exec,
-                '[NODE_EXEC]': self.node_exec or 'node',
-                '[REPO_ROOT]': str(self.repo_root),
-                '$RepoRoot': str(self.repo_root),
-                '$Username': self.username
-            }
-
-            result = config
-            for placeholder, replacement in replacements.items():
-                result = result.replace(placeholder, replacement)
-
-            # Platform-specific path fixes
-            if self.platform == 'windows':
-                result = result.replace('/', '\\')
-            else:
-                result = result.replace('\\', '/')
-
-            return result
-        else:
+        replacements = self._get_placeholder_map()
+
+        if isinstance(config, str):
+            return self._resolve_str(config, replacements)
+        if not isinstance(config, (dict, list)):
             return config
 
+        # Walk the structure iteratively, filling fresh containers so the
+        # caller's config is left untouched
+        resolved = dict(config) if isinstance(config, dict) else list(config)
+        stack = deque([resolved])
+        while stack:
+            node = stack.pop()
+            items = node.items() if isinstance(node, dict) else enumerate(node)
+            for key, value in items:
+                if isinstance(value, str):
+                    node[key] = self._resolve_str(value, replacements)
+                elif isinstance(value, dict):
+                    node[key] = dict(value)
+                    stack.append(node[key])
+                elif isinstance(value, list):
+                    node[key] = list(value)
+                    stack.append(node[key])
+
+        return resolved
+
+    @functools.cached_property
+    def mcp_configs(self) -> Dict[str, dict]:
+        """MCP configurations, built once until a path attribute changes"""
+        return self._generate_mcp_configs_impl()
+
     def generate_mcp_configs(self) -> Dict[str, dict]:
         """Generate correct MCP configurations with proper database paths"""
+        return self.mcp_configs
+
+    def _generate_mcp_configs_impl(self) -> Dict[str, dict]:
+        """Substitute placeholders into the config template and parse it"""
+        template = _CONFIG_TEMPLATE_JSON
+        if self.platform == 'windows':
+            # The template only uses '/' as a path separator
+            template = template.replace('/', '\\\\')
 
-        # CRITICAL FIX: SQLite MCP must point to unified database
-        unified_db_path = str(self.mcp_base / 'mcp-unified.db')
-
-        configs = {
-            'sqlite-data-warehouse': {
-                'command': self.node_exec or 'node',
-                'args': [
-                    str(self.repo_root / 'mcps' / 'sqlite' / 'server.js'),
-                    unified_db_path  # FIXED: Points to actual unified database
-                ],
-                'env': {
-                    'NODE_NO_WARNINGS': '1'
-                }
-            },
-            'expert-role-prompt': {
-                'command': self.node_exec or 'node',
-                'args': [str(self.repo_root / 'mcps' / 'expert-role-prompt' / 'server.js')]
-            },
-            'kimi-k2-resilient': {
-                'command': self.python_exec,
-                'args': [str(self.repo_root / 'mcps' / 'kimi-k2-resilient-enhanced' / 'server.py')]
-            },
-            'kimi-k2-code-context': {
-                'command': self.python_exec,
-                'args': [str(self.repo_root / 'mcps' / 'kimi-k2-code-context-enhanced' / 'server.py')]
-            },
-            'converse-enhanced': {
-                'command': self.python_exec,
-                'args': [str(self.repo_root / 'mcps' / 'converse-enhanced' / 'server.py')]
-            },
-            'filesystem': {
-                'command': self.node_exec or 'node',
-                'args': [
-                    str(self.repo_root / 'node_modules' / '@modelcontextprotocol' / 'server-filesystem' / 'dist' / 'index.js'),
-                    str(self.home_dir / 'Documents')  # Cross-platform documents folder
-                ]
-            },
-            'memory': {
-                'command': self.node_exec or 'node',
-                'args': [str(self.repo_root / 'node_modules' / '@modelcontextprotocol' / 'server-memory' / 'dist' / 'index.js')]
-            },
-            'sequential-thinking': {
-                'command': self.node_exec or 'node',
-                'args': [str(self.repo_root / 'node_modules' / '@modelcontextprotocol' / 'server-sequential-thinking' / 'dist' / 'index.js')]
-            },
-            'desktop-commander': {
-                'command': self.node_exec or 'node',
-                'args': [str(self.repo_root / 'node_modules' / '@wonderwhy-er' / 'desktop-commander' / 'dist' / 'index.js')]
-            },
-            'playwright': {
-                'command': self.node_exec or 'node',
-                'args': [str(self.repo_root / 'node_modules' / '@playwright' / 'mcp' / 'dist' / 'index.js')],
-                'env': {'PLAYWRIGHT_BROWSER': 'chromium'}
-            },
-            'git-ops': {
-                'command': self.node_exec or 'node',
-                'args': [str(self.repo_root / 'node_modules' / '@cyanheads' / 'git-mcp-server' / 'dist' / 'index.js')],
-                'env': {'GIT_REPO_PATH': str(self.repo_root)}
-            }
+        # Substituted values land inside JSON strings, so escape them as such
+        replacements = {
+            placeholder: json.dumps(self._fix_separators(value))[1:-1]
+            for placeholder, value in self._get_placeholder_map().items()
         }
 
-        # Resolve all paths in configs
-        return self.resolve_all_paths(configs)
+        substituted = self._PLACEHOLDER_RE.sub(lambda m: replacements[m.group(0)], template)
+        return json.loads(substituted)
 
     def install(self) -> bool:
         """Main installation process"""
@@ -256,25 +343,15 @@ class MCPInstaller:
         """Write MCP configuration to file"""
         config_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Load existing config or create new
-        if config_path.exists():
-            with open(config_path, 'r') as f:
-                config = json.load(f)
+        # Merge into the existing config, or create a new one
+        try:
+            existing = config_path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            config_path.write_bytes(dumps_json({'mcpServers': mcp_configs}))
         else:
-            config = {}
-
-        # Ensure mcpServers section exists
-        if 'mcpServers' not in config:
-            config['mcpServers'] = {}
-
-        # Add our MCP configurations
-        config['mcpServers'].update(mcp_configs)
-
-        # Write back to file
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
+            config_path.write_text(_merge_mcp_servers(existing, mcp_configs), encoding='utf-8')
 
-        self.logger.info(f"Configuration written to: {config_path}")
+        self.logger.info("Configuration written to: %s", config_path)
 
 if __name__ == '__main__':
     installer = MCPInstaller()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+JSON helpers shared by the MCP Federation Core installer and uninstaller
+Config I/O prefers orjson when installed; the top-level scanner lets callers
+rewrite one member of a config file and copy the rest through verbatim
+"""
+
+import re
+import json
+from typing import Iterator, Tuple
+
+try:
+    import orjson  # Optional: C-accelerated JSON for config I/O
+except ImportError:
+    orjson = None
+
+def loads_json(data: bytes):
+    """Parse JSON bytes, preferring orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps_json(obj) -> bytes:
+    """Serialize to indented JSON bytes, preferring orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode('utf-8')
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+
+def iter_top_level_members(text: str) -> Iterator[Tuple[str, object, int, int]]:
+    """Yield (key, value, start, end) for each member of a top-level JSON object.
+
+    text[start:end] is the member's original value text. Every member is
+    validated by the decoder, and the whole document is checked once the last
+    member has been yielded, so consume the iterator fully before trusting it.
+    """
+    decode = _JSON_DECODER.raw_decode
+    skip_ws = _JSON_WS.match
+
+    pos = skip_ws(text).end()
+    if text[pos:pos + 1] != '{':
+        raise json.JSONDecodeError("Expecting '{'", text, pos)
+    pos = skip_ws(text, pos + 1).end()
+
+    if text[pos:pos + 1] == '}':
+        pos += 1
+    else:
+        while True:
+            if text[pos:pos + 1] != '"':
+                raise json.JSONDecodeError("Expecting property name", text, pos)
+            key, pos = decode(text, pos)
+            pos = skip_ws(text, pos).end()
+            if text[pos:pos + 1] != ':':
+                raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+            pos = skip_ws(text, pos + 1).end()
+
+            value, end = decode(text, pos)
+            yield key, value, pos, end
+
+            pos = skip_ws(text, end).end()
+            delimiter = text[pos:pos + 1]
+            pos = skip_ws(text, pos + 1).end()
+            if delimiter == '}':
+                break
+            if delimiter != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+
+    if skip_ws(text, pos).end() != len(text):
+        raise json.JSONDecodeError("Extra data", text, pos)
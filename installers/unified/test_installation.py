@@ -6,10 +6,11 @@ Tests all critical fixes including database paths and placeholder resolution
 
 import os
 import sys
+import io
+import copy
 import json
 import sqlite3
 import tempfile
-import shutil
 import unittest
 from pathlib import Path
 from unittest.mock import patch, MagicMock
@@ -20,30 +21,45 @@ sys.path.insert(0, str(Path(__file__).parent))
 from install import MCPInstaller
 from db_manager import DatabaseManager
 from validator import InstallationValidator
+from uninstall import MCPFederationUninstaller
+from json_utils import iter_top_level_members
 
 class TestUnifiedInstaller(unittest.TestCase):
     """Test the unified installer functionality"""
 
+    @classmethod
+    def setUpClass(cls):
+        """Build the expensive shared fixtures once for the class"""
+        cls._shared_tmp = tempfile.TemporaryDirectory()
+        cls.shared_dir = Path(cls._shared_tmp.name)
+        cls.base_installer = MCPInstaller()
+
+        # Read-only database tests share one initialized database set
+        cls.shared_db_base = cls.shared_dir / 'mcp_base'
+        cls.shared_db_init_ok = DatabaseManager(cls.shared_db_base).initialize_all_databases()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._shared_tmp.cleanup()
+
     def setUp(self):
         """Set up test environment"""
-        self.test_dir = Path(tempfile.mkdtemp())
-        self.installer = MCPInstaller()
+        self._tmp = tempfile.TemporaryDirectory()
+        self.test_dir = Path(self._tmp.name)
+        self.installer = copy.copy(self.base_installer)
         self.installer.repo_root = self.test_dir
         self.installer.mcp_base = self.test_dir / 'mcp_base'
 
     def tearDown(self):
         """Clean up test environment"""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        self._tmp.cleanup()
 
     def test_unified_database_creation(self):
         """Test that mcp-unified.db is created correctly"""
-        db_manager = DatabaseManager(self.installer.mcp_base)
-        success = db_manager.initialize_all_databases()
-
-        self.assertTrue(success, "Database initialization should succeed")
+        self.assertTrue(self.shared_db_init_ok, "Database initialization should succeed")
 
         # Check that unified database exists
-        unified_db = self.installer.mcp_base / 'databases' / 'mcp-unified.db'
+        unified_db = self.shared_db_base / 'databases' / 'mcp-unified.db'
         self.assertTrue(unified_db.exists(), "mcp-unified.db should exist")
 
         # Check database size (should be > 1KB for a properly initialized DB)
@@ -52,10 +68,7 @@ class TestUnifiedInstaller(unittest.TestCase):
 
     def test_database_schema_initialization(self):
         """Test that database schemas are properly created"""
-        db_manager = DatabaseManager(self.installer.mcp_base)
-        db_manager.initialize_all_databases()
-
-        unified_db = self.installer.mcp_base / 'databases' / 'mcp-unified.db'
+        unified_db = self.shared_db_base / 'databases' / 'mcp-unified.db'
 
         with sqlite3.connect(unified_db) as conn:
             # Check that required tables exist
@@ -106,6 +119,17 @@ class TestUnifiedInstaller(unittest.TestCase):
         self.assertEqual(db_path_normalized, expected_path_normalized,
                         f"SQLite should point to unified DB, not {db_path}")
 
+    def test_config_cache_follows_path_changes(self):
+        """Test that cached configurations are rebuilt when mcp_base changes"""
+        configs = self.installer.generate_mcp_configs()
+        self.assertIs(configs, self.installer.generate_mcp_configs(),
+                      "Configurations should be cached between calls")
+
+        self.installer.mcp_base = self.test_dir / 'other_base'
+        db_path = self.installer.generate_mcp_configs()['sqlite-data-warehouse']['args'][1]
+        self.assertEqual(Path(db_path), self.test_dir / 'other_base' / 'mcp-unified.db',
+                         "Reassigning mcp_base should invalidate cached configurations")
+
     def test_cross_platform_paths(self):
         """Test that paths work across different platforms"""
         configs = self.installer.generate_mcp_configs()
@@ -136,6 +160,37 @@ class TestUnifiedInstaller(unittest.TestCase):
         self.assertIn('claude_desktop', config_paths,
                      "Should have Claude Desktop config path")
 
+    def test_detect_claude_installations_per_app(self):
+        """Test that each app is detected from its own config directory"""
+        self.installer.config_paths = {
+            'claude_desktop': self.test_dir / 'desktop' / 'claude_desktop_config.json',
+            'claude_code': self.test_dir / 'code' / 'claude_code_config.json'
+        }
+        (self.test_dir / 'code').mkdir()
+
+        with patch('install.shutil.which', return_value=None):
+            installed = self.installer.detect_claude_installations()
+
+        self.assertEqual(installed, ['claude_code'],
+                         "Only the app whose config directory exists should be detected")
+
+    def test_write_config_preserves_existing_settings(self):
+        """Test that writing configs merges mcpServers and keeps other settings"""
+        config_path = self.test_dir / 'claude' / 'claude_desktop_config.json'
+        config_path.parent.mkdir(parents=True)
+        config_path.write_text(json.dumps({
+            'theme': {'mode': 'dark'},
+            'mcpServers': {'user-mcp': {'command': 'node'}}
+        }))
+
+        self.installer._write_config(config_path, {'memory': {'command': 'node', 'args': []}})
+
+        with open(config_path) as f:
+            config = json.load(f)
+        self.assertEqual(config['theme'], {'mode': 'dark'}, "Other settings should be preserved")
+        self.assertEqual(set(config['mcpServers']), {'user-mcp', 'memory'},
+                         "Existing MCPs should be kept alongside new ones")
+
     def test_path_resolution(self):
         """Test that all path placeholders are resolved correctly"""
         test_config = {
@@ -157,6 +212,18 @@ class TestUnifiedInstaller(unittest.TestCase):
             self.assertNotIn(placeholder, resolved_str,
                            f"Placeholder {placeholder} should be resolved")
 
+    def test_path_resolution_leaves_plain_values(self):
+        """Test that separator fixes only touch strings built from placeholders"""
+        self.installer.platform = 'windows'
+        resolved = self.installer.resolve_all_paths({
+            'url': 'http://localhost:11434/api',
+            'path': '[INSTALL_PATH]/servers'
+        })
+
+        self.assertEqual(resolved['url'], 'http://localhost:11434/api',
+                         "Non-path values should not be rewritten")
+        self.assertNotIn('/', resolved['path'], "Resolved paths should use Windows separators")
+
     @patch('sqlite3.connect')
     def test_database_query_functionality(self, mock_connect):
         """Test that database queries work without SQLITE_NOTADB errors"""
@@ -182,11 +249,12 @@ class TestDatabaseManager(unittest.TestCase):
     """Test database manager functionality"""
 
     def setUp(self):
-        self.test_dir = Path(tempfile.mkdtemp())
+        self._tmp = tempfile.TemporaryDirectory()
+        self.test_dir = Path(self._tmp.name)
         self.db_manager = DatabaseManager(self.test_dir)
 
     def tearDown(self):
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        self._tmp.cleanup()
 
     def test_all_databases_initialized(self):
         """Test that all required databases are created"""
@@ -214,14 +282,15 @@ class TestValidator(unittest.TestCase):
     """Test installation validator"""
 
     def setUp(self):
-        self.test_dir = Path(tempfile.mkdtemp())
+        self._tmp = tempfile.TemporaryDirectory()
+        self.test_dir = Path(self._tmp.name)
         self.config_paths = {
             'claude_desktop': self.test_dir / 'config.json'
         }
         self.validator = InstallationValidator(self.test_dir, self.config_paths)
 
     def tearDown(self):
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        self._tmp.cleanup()
 
     def test_sqlite_config_validation(self):
         """Test SQLite configuration validation"""
@@ -274,6 +343,106 @@ class TestValidator(unittest.TestCase):
         self.assertIn('INSTALL_PATH', claude_result, "Should detect [INSTALL_PATH] placeholder")
         self.assertIn('USERNAME', claude_result, "Should detect [USERNAME] placeholder")
 
+    def test_api_key_detection(self):
+        """Test that only keys with a non-blank value count as configured"""
+        (self.test_dir / '.env').write_text(
+            'MOONSHOT_API_KEY=abc\nOPENAI_API_KEY=\nXAI_API_KEY=  \n# BRAVE_API_KEY=x\n')
+        validator = InstallationValidator(self.test_dir / 'mcp_base', self.config_paths)
+
+        success, results = validator.validate_api_keys()
+        self.assertTrue(success)
+        self.assertEqual(results['MOONSHOT_API_KEY'], "✅ Configured")
+        for key in ('OPENAI_API_KEY', 'XAI_API_KEY', 'BRAVE_API_KEY', 'ANTHROPIC_API_KEY'):
+            self.assertEqual(results[key], "⚠️ Not configured", key)
+        self.assertEqual(results['summary'], "✅ 1/6 API keys configured")
+
+    def test_validation_results_are_memoized(self):
+        """Test that a validation runs once until the cache is cleared"""
+        first = self.validator.validate_configurations()
+        self.assertIs(self.validator.validate_configurations(), first)
+
+        self.validator.clear_cache()
+        self.assertIsNot(self.validator.validate_configurations(), first)
+
+    def test_full_validation_prints_without_report_file(self):
+        """Test that a missing mcp_base still prints the report instead of failing"""
+        validator = InstallationValidator(self.test_dir / 'missing', self.config_paths)
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            validator.run_full_validation()
+
+        self.assertIn('VALIDATION', stdout.getvalue().upper())
+        self.assertFalse((self.test_dir / 'missing').exists())
+
+class TestUninstaller(unittest.TestCase):
+    """Test the safe uninstaller"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.test_dir = Path(self._tmp.name)
+        self._cwd = os.getcwd()
+        os.chdir(self.test_dir)  # Backups are written under the working directory
+
+        self.config_path = self.test_dir / 'claude_desktop_config.json'
+        self.config_text = (
+            '{\n'
+            '    "theme": {"mode": "dark"},\n'
+            '    "mcpServers": {"memory": {"command": "node"}, "my-mcp": {"command": "python"}}\n'
+            '}\n'
+        )
+        self.config_path.write_text(self.config_text)
+
+        self.uninstaller = MCPFederationUninstaller()
+        self.uninstaller.config_paths = {'claude_desktop': self.config_path}
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_selective_removal_preserves_user_mcps(self):
+        """Test that only Federation MCPs are removed from configs"""
+        removed, preserved = self.uninstaller.remove_federation_mcps_only(self.config_path)
+
+        self.assertEqual((removed, preserved), (1, 1))
+        with open(self.config_path) as f:
+            config = json.load(f)
+        self.assertEqual(list(config['mcpServers']), ['my-mcp'], "User MCPs should be preserved")
+        self.assertEqual(config['theme'], {'mode': 'dark'}, "Other settings should be preserved")
+
+    def test_complete_uninstall_clears_only_mcp_servers(self):
+        """Test that complete uninstall empties mcpServers and leaves the rest verbatim"""
+        with patch('builtins.input', return_value='REMOVE ALL'):
+            self.assertTrue(self.uninstaller.complete_uninstall(self.test_dir / 'mcp_base'))
+
+        expected = self.config_text.replace(
+            '{"memory": {"command": "node"}, "my-mcp": {"command": "python"}}', '{}')
+        self.assertEqual(self.config_path.read_text(), expected)
+
+class TestJsonUtils(unittest.TestCase):
+    """Test the shared top-level JSON scanner"""
+
+    def members(self, text):
+        return [(key, value, text[start:end]) for key, value, start, end in iter_top_level_members(text)]
+
+    def test_values_are_returned_verbatim(self):
+        """Test braces and escaped quotes inside strings don't end a member early"""
+        text = '{"a": {"b": "} {\\" ,"}, "c" : [1, {"d": "\\\\"}] }'
+        self.assertEqual(self.members(text), [
+            ('a', {'b': '} {" ,'}, '{"b": "} {\\" ,"}'),
+            ('c', [1, {'d': '\\'}], '[1, {"d": "\\\\"}]'),
+        ])
+
+    def test_missing_key_and_empty_object(self):
+        """Test documents without the wanted key scan cleanly"""
+        self.assertEqual(self.members(' { } '), [])
+        self.assertNotIn('mcpServers', [key for key, _, _ in self.members('{"theme": 1}')])
+
+    def test_rejects_invalid_documents(self):
+        """Test non-object top levels and malformed objects raise JSONDecodeError"""
+        for text in ('[1, 2]', '"mcpServers"', '{1: 2}', '{"a" 1}', '{"a": 1 "b": 2}', '{"a": 1} x'):
+            with self.subTest(text=text):
+                with self.assertRaises(json.JSONDecodeError):
+                    self.members(text)
+
 def run_comprehensive_tests():
     """Run comprehensive test suite"""
     print("🧪 Running MCP Federation Core Installation Tests")
@@ -287,6 +456,8 @@ def run_comprehensive_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestUnifiedInstaller))
     suite.addTests(loader.loadTestsFromTestCase(TestDatabaseManager))
     suite.addTests(loader.loadTestsFromTestCase(TestValidator))
+    suite.addTests(loader.loadTestsFromTestCase(TestUninstaller))
+    suite.addTests(loader.loadTestsFromTestCase(TestJsonUtils))
 
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
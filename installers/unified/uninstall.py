@@ -9,16 +9,96 @@ import os
 import sys
 import json
 import shutil
-import sqlite3
-import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Set
 from datetime import datetime
-import argparse
+
+from json_utils import loads_json, dumps_json, iter_top_level_members
+
+def _find_top_level_value(text: str, key: str):
+    """Locate a top-level member of a JSON object without re-serializing it.
+
+    Returns (value, start, end) for the last occurrence of key, or None if absent.
+    """
+    found = None
+    for name, value, start, end in iter_top_level_members(text):
+        if name == key:
+            found = (value, start, end)
+    return found
+
+def _write_json_atomic(path: Path, obj) -> None:
+    """Write JSON to a sibling temp file and swap it into place in one step"""
+    _write_bytes_atomic(path, dumps_json(obj))
+
+def _write_bytes_atomic(path: Path, data: bytes) -> None:
+    """Write bytes to a sibling temp file and swap it into place in one step"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # Keep the original file's permissions (configs may hold API keys)
+        try:
+            shutil.copymode(path, tmp_path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+# Config file locations relative to the user's home directory, per platform
+_PLATFORM_CONFIGS = {
+    'windows': {
+        'claude_desktop': ('AppData', 'Roaming', 'Claude', 'claude_desktop_config.json'),
+        'claude_code': ('AppData', 'Roaming', 'Claude', 'claude_code_config.json'),
+        'zed': ('AppData', 'Roaming', 'Zed', 'settings.json')
+    },
+    'darwin': {
+        'claude_desktop': ('Library', 'Application Support', 'Claude', 'claude_desktop_config.json'),
+        'claude_code': ('Library', 'Application Support', 'Claude', 'claude_code_config.json'),
+        'zed': ('.config', 'zed', 'settings.json')
+    },
+    'linux': {
+        'claude_desktop': ('.config', 'Claude', 'claude_desktop_config.json'),
+        'claude_code': ('.config', 'Claude', 'claude_code_config.json'),
+        'zed': ('.config', 'zed', 'settings.json')
+    }
+}
+
+@functools.lru_cache(maxsize=None)
+def _config_paths_for(platform_name: str, home: str) -> Dict[str, Path]:
+    """Build the config paths for a platform/home pair once per process"""
+    return {
+        app_name: Path(home, *parts)
+        for app_name, parts in _PLATFORM_CONFIGS[platform_name].items()
+    }
+
+def _copy_many(jobs: Dict[str, Tuple]):
+    """Run shutil.copy2 for independent (src, dst) jobs concurrently.
+
+    Yields (name, error) pairs in job order; error is None on success.
+    Jobs whose source file does not exist are skipped silently.
+    """
+    if not jobs:
+        return
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {name: executor.submit(shutil.copy2, src, dst) for name, (src, dst) in jobs.items()}
+        for name, future in futures.items():
+            error = future.exception()
+            if (isinstance(error, FileNotFoundError)
+                    and os.fspath(error.filename) == os.fspath(jobs[name][0])):
+                continue
+            yield name, error
 
 class MCPFederationUninstaller:
     def __init__(self):
-        self.logger = logging.getLogger(__name__)
         self.platform = self._detect_platform()
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
@@ -41,6 +121,7 @@ class MCPFederationUninstaller:
             'git-ops',                       # Git operations
             'sequential-thinking'            # Sequential thinking
         ]
+        self.FEDERATION_MCPS_SET = frozenset(self.FEDERATION_MCPS)
 
         # Total expected Federation MCPs
         self.TOTAL_FEDERATION_MCPS = 15
@@ -52,62 +133,28 @@ class MCPFederationUninstaller:
             'memory-graph.db',
             'rag-context.db'
         ]
+        self.FEDERATION_DATABASES_SET = frozenset(self.FEDERATION_DATABASES)
 
         # Platform-specific config paths
         self.config_paths = self._get_config_paths()
 
     def _detect_platform(self) -> str:
         """Detect operating system platform"""
-        import platform
-        system = platform.system().lower()
-        return {
-            'windows': 'windows',
-            'darwin': 'darwin',
-            'linux': 'linux'
-        }.get(system, 'linux')
+        return {'win32': 'windows', 'darwin': 'darwin'}.get(sys.platform, 'linux')
 
     def _get_config_paths(self) -> Dict[str, Path]:
         """Get platform-specific configuration paths"""
-        home = Path.home()
-
-        if self.platform == 'windows':
-            return {
-                'claude_desktop': home / 'AppData' / 'Roaming' / 'Claude' / 'claude_desktop_config.json',
-                'claude_code': home / 'AppData' / 'Roaming' / 'Claude' / 'claude_code_config.json',
-                'zed': home / 'AppData' / 'Roaming' / 'Zed' / 'settings.json'
-            }
-        elif self.platform == 'darwin':
-            return {
-                'claude_desktop': home / 'Library' / 'Application Support' / 'Claude' / 'claude_desktop_config.json',
-                'claude_code': home / 'Library' / 'Application Support' / 'Claude' / 'claude_code_config.json',
-                'zed': home / '.config' / 'zed' / 'settings.json'
-            }
-        else:  # Linux
-            return {
-                'claude_desktop': home / '.config' / 'Claude' / 'claude_desktop_config.json',
-                'claude_code': home / '.config' / 'Claude' / 'claude_code_config.json',
-                'zed': home / '.config' / 'zed' / 'settings.json'
-            }
-
-    def backup_configurations(self) -> Dict[str, Path]:
-        """Create backups of all configuration files"""
-        print("\n[BACKUP] Creating configuration backups...")
-        backups = {}
+        # Copy so callers can adjust their instance without touching the cache
+        return dict(_config_paths_for(self.platform, str(Path.home())))
 
+    def _create_backup_dir(self) -> Path:
+        """Create this run's timestamped backup directory"""
         backup_dir = Path.cwd() / 'uninstaller_backups' / self.timestamp
         backup_dir.mkdir(parents=True, exist_ok=True)
+        return backup_dir
 
-        for app_name, config_path in self.config_paths.items():
-            if config_path.exists():
-                backup_path = backup_dir / f"{app_name}_backup.json"
-                try:
-                    shutil.copy2(config_path, backup_path)
-                    backups[app_name] = backup_path
-                    print(f"  [OK] Backed up {app_name} configuration")
-                except Exception as e:
-                    print(f"  [WARN] Could not backup {app_name}: {e}")
-
-        # Save backup manifest
+    def _write_backup_manifest(self, backup_dir: Path, backups: Dict[str, Path]) -> None:
+        """Save the manifest restore_from_backup uses to put configs back"""
         manifest = {
             'timestamp': self.timestamp,
             'platform': self.platform,
@@ -116,95 +163,132 @@ class MCPFederationUninstaller:
         }
 
         manifest_path = backup_dir / 'manifest.json'
-        with open(manifest_path, 'w') as f:
-            json.dump(manifest, f, indent=2)
+        with open(manifest_path, 'wb') as f:
+            f.write(dumps_json(manifest))
 
         print(f"\n[DIR] Backups saved to: {backup_dir}")
+
+    def backup_configurations(self) -> Dict[str, Path]:
+        """Create backups of all configuration files"""
+        print("\n[BACKUP] Creating configuration backups...")
+        backups = {}
+        backup_dir = self._create_backup_dir()
+
+        jobs = {
+            app_name: (config_path, backup_dir / f"{app_name}_backup.json")
+            for app_name, config_path in self.config_paths.items()
+        }
+        for app_name, error in _copy_many(jobs):
+            if error is None:
+                backups[app_name] = jobs[app_name][1]
+                print(f"  [OK] Backed up {app_name} configuration")
+            else:
+                print(f"  [WARN] Could not backup {app_name}: {error}")
+
+        self._write_backup_manifest(backup_dir, backups)
         return backups
 
+    def _backup_and_clean_config(self, app_name: str, config_path: Path,
+                                 backup_dir: Path, backups: Dict[str, Path]) -> Tuple[int, int]:
+        """Back up one config file, then strip Federation MCPs from it.
+
+        A config that cannot be backed up is left unchanged.
+        """
+        backup_path = backup_dir / f"{app_name}_backup.json"
+        try:
+            shutil.copy2(config_path, backup_path)
+        except FileNotFoundError:
+            return 0, 0
+        except Exception as e:
+            print(f"\n  [WARN] Could not backup {app_name}, leaving it unchanged: {e}")
+            return 0, 0
+
+        backups[app_name] = backup_path
+        print(f"\n[CONFIG] Processing {app_name} configuration...")
+        print(f"  [OK] Backed up {app_name} configuration")
+        return self.remove_federation_mcps_only(config_path)
+
     def get_installed_mcps(self, config_path: Path) -> Set[str]:
         """Get list of currently installed MCPs from config"""
-        if not config_path.exists():
-            return set()
-
         try:
-            with open(config_path, 'r') as f:
-                config = json.load(f)
+            config = loads_json(config_path.read_bytes())
 
             mcp_servers = config.get('mcpServers', {})
             return set(mcp_servers.keys())
+        except FileNotFoundError:
+            return set()
         except Exception as e:
-            self.logger.error(f"Error reading config: {e}")
+            print(f"[ERROR] Error reading config: {e}", file=sys.stderr)
             return set()
 
     def remove_federation_mcps_only(self, config_path: Path) -> Tuple[int, int]:
         """Remove ONLY Federation MCPs, preserve user MCPs"""
-        if not config_path.exists():
-            return 0, 0
-
         try:
-            with open(config_path, 'r') as f:
-                config = json.load(f)
+            config = loads_json(config_path.read_bytes())
 
             mcp_servers = config.get('mcpServers', {})
-            removed_count = 0
-            preserved_count = 0
-
-            # Identify MCPs to remove - check exact matches
-            mcps_to_remove = []
-            for mcp_name in list(mcp_servers.keys()):
-                # Check if it's a Federation MCP (exact match)
-                if mcp_name in self.FEDERATION_MCPS:
-                    mcps_to_remove.append(mcp_name)
-                    removed_count += 1
-                else:
-                    preserved_count += 1
-
-            # Remove Federation MCPs
-            for mcp_name in mcps_to_remove:
-                del mcp_servers[mcp_name]
-                print(f"    [-] Removed: {mcp_name}")
-
-            # Show preserved MCPs
-            for mcp_name in mcp_servers.keys():
-                print(f"    [+] Preserved: {mcp_name}")
+
+            # Split Federation MCPs (exact matches) from the user's own in one pass each
+            fed_set = self.FEDERATION_MCPS_SET
+            mcps_to_remove = [name for name in mcp_servers if name in fed_set]
+            kept = {name: cfg for name, cfg in mcp_servers.items() if name not in fed_set}
+            removed_count, preserved_count = len(mcps_to_remove), len(kept)
+
+            # Report removed and preserved MCPs in a single write
+            lines = [f"    [-] Removed: {mcp_name}" for mcp_name in mcps_to_remove]
+            lines.extend(f"    [+] Preserved: {mcp_name}" for mcp_name in kept)
+            if lines:
+                sys.stdout.write('\n'.join(lines) + '\n')
+
+            # Nothing of ours in this config - leave the file untouched
+            if not mcps_to_remove:
+                return 0, preserved_count
+
+            config['mcpServers'] = kept
 
             # Save updated config
-            with open(config_path, 'w') as f:
-                json.dump(config, f, indent=2)
+            _write_json_atomic(config_path, config)
 
             return removed_count, preserved_count
 
+        except FileNotFoundError:
+            return 0, 0
         except Exception as e:
-            self.logger.error(f"Error updating config: {e}")
+            print(f"[ERROR] Error updating config: {e}", file=sys.stderr)
             return 0, 0
 
     def remove_federation_databases(self, mcp_base: Path) -> int:
         """Remove Federation-specific databases only"""
         print("\n[DATABASE] Removing Federation databases...")
 
-        databases_dir = mcp_base / 'databases'
-        if not databases_dir.exists():
+        try:
+            entries = os.scandir(mcp_base / 'databases')
+        except FileNotFoundError:
             print("  [INFO] No databases directory found")
             return 0
 
+        # One directory pass: delete Federation databases, note everything else
+        fed_set = self.FEDERATION_DATABASES_SET
         removed_count = 0
-        for db_name in self.FEDERATION_DATABASES:
-            db_path = databases_dir / db_name
-            if db_path.exists():
-                try:
-                    os.remove(db_path)
-                    print(f"  [-] Removed: {db_name}")
-                    removed_count += 1
-                except Exception as e:
-                    print(f"  [WARN] Could not remove {db_name}: {e}")
-
-        # Check for other databases (preserve them)
-        remaining_dbs = list(databases_dir.glob('*.db'))
+        remaining_dbs = []
+        with entries:
+            for entry in entries:
+                if entry.name in fed_set:
+                    try:
+                        os.unlink(entry.path)
+                        print(f"  [-] Removed: {entry.name}")
+                        removed_count += 1
+                    except FileNotFoundError:
+                        pass
+                    except Exception as e:
+                        print(f"  [WARN] Could not remove {entry.name}: {e}")
+                elif entry.name.endswith('.db') and entry.is_file(follow_symlinks=False):
+                    remaining_dbs.append(entry.name)
+
         if remaining_dbs:
             print("\n  Preserved databases:")
-            for db in remaining_dbs:
-                print(f"    [+] {db.name}")
+            for db_name in remaining_dbs:
+                print(f"    [+] {db_name}")
 
         return removed_count
 
@@ -216,19 +300,19 @@ class MCPFederationUninstaller:
         print("\n[WARNING] This will ONLY remove MCP Federation components")
         print("[OK] Your existing MCPs and configurations will be preserved")
 
-        # Create backups first
-        backups = self.backup_configurations()
-
-        # Process each config file
+        # Back up and clean each config file in a single pass
+        print("\n[BACKUP] Backing up and processing configurations...")
+        backup_dir = self._create_backup_dir()
+        backups = {}
         total_removed = 0
         total_preserved = 0
 
         for app_name, config_path in self.config_paths.items():
-            if config_path.exists():
-                print(f"\n[CONFIG] Processing {app_name} configuration...")
-                removed, preserved = self.remove_federation_mcps_only(config_path)
-                total_removed += removed
-                total_preserved += preserved
+            removed, preserved = self._backup_and_clean_config(app_name, config_path, backup_dir, backups)
+            total_removed += removed
+            total_preserved += preserved
+
+        self._write_backup_manifest(backup_dir, backups)
 
         # Remove Federation databases
         db_removed = self.remove_federation_databases(mcp_base)
@@ -264,23 +348,26 @@ class MCPFederationUninstaller:
 
         # Remove all MCPs from configs
         for app_name, config_path in self.config_paths.items():
-            if config_path.exists():
-                print(f"\n[CONFIG] Clearing {app_name} configuration...")
-                try:
-                    with open(config_path, 'r') as f:
-                        config = json.load(f)
+            try:
+                data = config_path.read_bytes()
+            except FileNotFoundError:
+                continue
 
-                    # Clear all MCPs
-                    if 'mcpServers' in config:
-                        mcp_count = len(config['mcpServers'])
-                        config['mcpServers'] = {}
-                        print(f"  [-] Removed {mcp_count} MCPs")
+            print(f"\n[CONFIG] Clearing {app_name} configuration...")
+            try:
+                # Splice an empty object over mcpServers; the rest of the
+                # file is kept byte-for-byte
+                text = data.decode('utf-8')
+                member = _find_top_level_value(text, 'mcpServers')
 
-                    with open(config_path, 'w') as f:
-                        json.dump(config, f, indent=2)
+                # Clear all MCPs
+                if member is not None:
+                    mcp_servers, start, end = member
+                    _write_bytes_atomic(config_path, (text[:start] + '{}' + text[end:]).encode('utf-8'))
+                    print(f"  [-] Removed {len(mcp_servers)} MCPs")
 
-                except Exception as e:
-                    print(f"  [WARN] Error: {e}")
+            except Exception as e:
+                print(f"  [WARN] Error: {e}")
 
         # Remove entire mcp_base directory
         if mcp_base.exists():
@@ -306,12 +393,15 @@ class MCPFederationUninstaller:
 
         # Find available backups
         backups_root = Path.cwd() / 'uninstaller_backups'
-        if not backups_root.exists():
-            print("[X] No backups found")
-            return False
+        try:
+            with os.scandir(backups_root) as entries:
+                available_backups = sorted(
+                    (entry for entry in entries if entry.is_dir(follow_symlinks=False)),
+                    key=lambda entry: entry.name
+                )
+        except FileNotFoundError:
+            available_backups = []
 
-        # List available backups
-        available_backups = sorted(backups_root.glob('*'))
         if not available_backups:
             print("[X] No backups found")
             return False
@@ -326,33 +416,32 @@ class MCPFederationUninstaller:
                 return False
 
             try:
-                backup_dir = available_backups[int(choice) - 1]
+                backup_dir = Path(available_backups[int(choice) - 1].path)
             except (ValueError, IndexError):
                 print("[X] Invalid selection")
                 return False
 
         # Load manifest
-        manifest_path = backup_dir / 'manifest.json'
-        if not manifest_path.exists():
+        try:
+            manifest = loads_json((backup_dir / 'manifest.json').read_bytes())
+        except FileNotFoundError:
             print("[X] Invalid backup (no manifest)")
             return False
 
-        with open(manifest_path, 'r') as f:
-            manifest = json.load(f)
-
         # Restore each backup
         restored_count = 0
-        for app_name, backup_path in manifest['backups'].items():
-            backup_file = Path(backup_path)
-            original_path = Path(manifest['original_paths'][app_name])
-
-            if backup_file.exists():
-                try:
-                    shutil.copy2(backup_file, original_path)
-                    print(f"  [OK] Restored {app_name}")
-                    restored_count += 1
-                except Exception as e:
-                    print(f"  [WARN] Could not restore {app_name}: {e}")
+        original_paths = manifest['original_paths']
+        # Manifest entries are already OS path strings; use them as-is
+        jobs = {
+            app_name: (backup_path, original_paths[app_name])
+            for app_name, backup_path in manifest['backups'].items()
+        }
+        for app_name, error in _copy_many(jobs):
+            if error is None:
+                print(f"  [OK] Restored {app_name}")
+                restored_count += 1
+            else:
+                print(f"  [WARN] Could not restore {app_name}: {error}")
 
         print(f"\n[OK] Restored {restored_count} configuration(s)")
         return True
@@ -368,26 +457,16 @@ class MCPFederationUninstaller:
             'all_installed_mcps': []
         }
 
-        # Check all config files
-        for app_name, config_path in self.config_paths.items():
-            if config_path.exists():
-                installed_mcps = self.get_installed_mcps(config_path)
-                analysis['all_installed_mcps'].extend(installed_mcps)
-
-        # Remove duplicates
-        analysis['all_installed_mcps'] = list(set(analysis['all_installed_mcps']))
-
-        # Check each Federation MCP explicitly
-        for mcp_name in self.FEDERATION_MCPS:
-            if mcp_name in analysis['all_installed_mcps']:
-                analysis['federation_mcps_found'].append(mcp_name)
-            else:
-                analysis['federation_mcps_missing'].append(mcp_name)
+        # Collect MCPs from all config files (missing files yield an empty set)
+        installed = set()
+        for config_path in self.config_paths.values():
+            installed |= self.get_installed_mcps(config_path)
+        analysis['all_installed_mcps'] = list(installed)
 
-        # Find user MCPs (any not in Federation list)
-        for mcp in analysis['all_installed_mcps']:
-            if mcp not in self.FEDERATION_MCPS:
-                analysis['user_mcps_found'].append(mcp)
+        # Split installed MCPs into Federation and user MCPs
+        analysis['federation_mcps_found'] = sorted(installed & self.FEDERATION_MCPS_SET)
+        analysis['federation_mcps_missing'] = sorted(self.FEDERATION_MCPS_SET - installed)
+        analysis['user_mcps_found'] = sorted(installed - self.FEDERATION_MCPS_SET)
 
         analysis['total_federation_found'] = len(analysis['federation_mcps_found'])
         return analysis
@@ -401,18 +480,16 @@ class MCPFederationUninstaller:
 
         if analysis['federation_mcps_found']:
             print(f'\n[OK] Installed Federation MCPs ({len(analysis["federation_mcps_found"])}):')
-            for mcp in sorted(analysis['federation_mcps_found']):
-                print(f'  - {mcp}')
+            print('\n'.join(f'  - {mcp}' for mcp in sorted(analysis['federation_mcps_found'])))
 
         if analysis['federation_mcps_missing']:
             print(f'\n[WARN] Missing Federation MCPs ({len(analysis["federation_mcps_missing"])}):')
-            for mcp in sorted(analysis['federation_mcps_missing']):
-                print(f'  - {mcp} (not currently installed)')
+            print('\n'.join(f'  - {mcp} (not currently installed)'
+                            for mcp in sorted(analysis['federation_mcps_missing'])))
 
         if analysis['user_mcps_found']:
             print(f'\n[INFO] User MCPs found ({len(analysis["user_mcps_found"])}):')
-            for mcp in sorted(analysis['user_mcps_found']):
-                print(f'  + {mcp}')
+            print('\n'.join(f'  + {mcp}' for mcp in sorted(analysis['user_mcps_found'])))
 
         print('\n[TARGET] Uninstaller will remove ALL installed Federation MCPs')
         print('         and clean up any Federation directories/databases')
@@ -429,12 +506,15 @@ class MCPFederationUninstaller:
 
         print("\n[LIST] Federation databases that would be removed:")
         databases_dir = mcp_base / 'databases'
-        if databases_dir.exists():
-            for db_name in self.FEDERATION_DATABASES:
-                db_path = databases_dir / db_name
-                if db_path.exists():
-                    size = db_path.stat().st_size / 1024  # KB
-                    print(f"  - {db_name} ({size:.1f} KB)")
+        fed_set = self.FEDERATION_DATABASES_SET
+        try:
+            with os.scandir(databases_dir) as entries:
+                for entry in entries:
+                    if entry.name in fed_set:
+                        size = entry.stat().st_size / 1024  # KB
+                        print(f"  - {entry.name} ({size:.1f} KB)")
+        except FileNotFoundError:
+            pass
 
         print("\n[OK] Dry run complete - no changes made")
 
@@ -446,23 +526,17 @@ class MCPFederationUninstaller:
         print("\nThis tool safely removes MCP Federation components")
         print("Default mode preserves your existing MCPs")
 
-        # Auto-detect mcp_base
-        possible_paths = [
-            Path.cwd() / 'mcp_base',
-            Path.cwd().parent / 'mcp_base',
-            Path.cwd().parent.parent / 'mcp_base',
-            Path.home() / 'mcp_base'
-        ]
-
-        mcp_base = None
-        for path in possible_paths:
-            if path.exists():
-                mcp_base = path
-                break
+        # Auto-detect mcp_base (candidates are built and probed lazily)
+        cwd = Path.cwd()
+        possible_paths = (
+            base / 'mcp_base'
+            for base in (cwd, cwd.parent, cwd.parent.parent, Path.home())
+        )
+        mcp_base = next((path for path in possible_paths if path.exists()), None)
 
         if not mcp_base:
             mcp_base_str = input("\nEnter mcp_base path (or press Enter for './mcp_base'): ").strip()
-            mcp_base = Path(mcp_base_str) if mcp_base_str else Path.cwd() / 'mcp_base'
+            mcp_base = Path(mcp_base_str) if mcp_base_str else cwd / 'mcp_base'
 
         print(f"\nUsing mcp_base: {mcp_base}")
 
@@ -495,6 +569,8 @@ class MCPFederationUninstaller:
 
 def main():
     """Main entry point"""
+    import argparse  # Only needed for the CLI entry point
+
     parser = argparse.ArgumentParser(
         description='Safe uninstaller for MCP Federation Core'
     )
@@ -525,12 +601,6 @@ def main():
 
     args = parser.parse_args()
 
-    # Setup logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(message)s'
-    )
-
     uninstaller = MCPFederationUninstaller()
 
     if args.mode:
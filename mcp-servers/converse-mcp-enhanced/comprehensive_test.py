@@ -4,22 +4,36 @@ Comprehensive Test Suite for Converse-Enhanced MCP
 Tests all functionality as Claude Desktop would use it
 """
 
+import compileall
 import json
+import queue
 import subprocess
 import sys
+import threading
 import time
 import os
 from datetime import datetime
 
 class MCPTester:
+    # JSON-RPC envelope with the constant parts pre-rendered; only method, params and id vary
+    _ENVELOPE_FMT = '{{"jsonrpc": "2.0", "method": {method}, "params": {params}, "id": {id}}}\n'
+
     def __init__(self):
         self.process = None
         self.request_id = 0
         self.results = []
+        self._responses = queue.Queue()
+        self._ready = threading.Event()
+        self._server_ready = False
 
     def start_server(self):
         """Start the MCP server"""
         print("Starting MCP Server...")
+        # Byte-compile the server sources so the spawned interpreter loads cached bytecode
+        compileall.compile_dir("src", quiet=1)
+        env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+
         self.process = subprocess.Popen(
             [sys.executable, "src/mcp_server.py"],
             stdin=subprocess.PIPE,
@@ -27,30 +41,53 @@ class MCPTester:
             stderr=subprocess.PIPE,
             text=True,
             bufsize=0,
-            env={**os.environ, "PYTHONUNBUFFERED": "1"}
+            env=env
         )
-        time.sleep(2)  # Give server time to initialize
-        return self.process.poll() is None
+        threading.Thread(target=self._reader_loop, daemon=True).start()
+        threading.Thread(target=self._stderr_loop, daemon=True).start()
+
+        # Wait for the server's READY line rather than a fixed sleep
+        self._ready.wait(timeout=5)
+        return self._server_ready and self.process.poll() is None
 
-    def send_request(self, method, params=None):
-        """Send JSON-RPC request and get response"""
+    def _reader_loop(self):
+        """Queue every JSON-RPC message the server writes to stdout"""
+        for line in self.process.stdout:
+            try:
+                self._responses.put(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Ignore stray non-protocol output
+
+    def _stderr_loop(self):
+        """Watch stderr for the READY handshake, then keep draining it"""
+        for line in self.process.stderr:
+            if not self._server_ready and line.strip() == "READY":
+                self._server_ready = True
+                self._ready.set()
+        self._ready.set()  # Server exited; stop waiting for it
+
+    def send_request(self, method, params=None, timeout=2.0):
+        """Send JSON-RPC request and return its response, or None on timeout"""
         self.request_id += 1
-        request = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params or {},
-            "id": self.request_id
-        }
+        request = self._ENVELOPE_FMT.format(
+            method=json.dumps(method),
+            params=json.dumps(params or {}),
+            id=self.request_id
+        )
 
         # Send request
-        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.write(request)
         self.process.stdin.flush()
 
-        # Try to read response
-        time.sleep(1)
-
-        # For testing, we'll check if process is still running
-        return self.process.poll() is None
+        # Wait for the response carrying our id, skipping notifications
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                message = self._responses.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return None
+            if message.get("id") == self.request_id:
+                return message
 
     def stop_server(self):
         """Stop the MCP server"""
@@ -107,7 +144,7 @@ class MCPTester:
             "arguments": {
                 "prompt": "What is 2 + 2?"
             }
-        })
+        }, timeout=60)
         self.results.append(("chat_no_model", result))
         return result
 
@@ -120,7 +157,7 @@ class MCPTester:
                 "prompt": "Write a Python hello world function",
                 "model": "codellama"
             }
-        })
+        }, timeout=60)
         self.results.append(("chat_with_model", result))
         return result
 
@@ -173,11 +210,12 @@ class MCPTester:
         print("TEST RESULTS SUMMARY")
         print("=" * 60)
 
-        passed = sum(1 for _, r in self.results if r)
+        # A test passes when the server answered without a JSON-RPC error
+        passed = sum(1 for _, r in self.results if r and "error" not in r)
         total = len(self.results)
 
-        for test_name, success in self.results:
-            status = "PASS" if success else "FAIL"
+        for test_name, response in self.results:
+            status = "PASS" if response and "error" not in response else "FAIL"
             print(f"  {test_name}: {status}")
 
         print(f"\nTotal: {passed}/{total} tests passed")
@@ -9,13 +9,12 @@ import json
 import os
 import sys
 import logging
-from typing import Any, Sequence
-from pathlib import Path
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Sequence, Tuple
 
-# Add current directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent))
-
-# Import our API manager and Ollama manager
+# Import our API manager and Ollama manager; run as a script, so Python
+# already puts this file's directory first on sys.path
 from server import OptimizedAPIManager
 from ollama_manager import OllamaManager
 
@@ -29,6 +28,26 @@ except ImportError:
     print("ERROR: MCP SDK not installed. Run: pip install mcp", file=sys.stderr)
     sys.exit(1)
 
+try:
+    import orjson  # Optional: C-accelerated JSON for tool results
+except ImportError:
+    orjson = None
+
+
+# Tool results are read by the client, not people; set CONVERSE_PRETTY_JSON=1 to indent them
+_PRETTY_JSON = os.getenv("CONVERSE_PRETTY_JSON") == "1"
+
+
+def _dumps_json(obj) -> str:
+    """Serialize a tool result to JSON, preferring orjson when it is installed"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if _PRETTY_JSON else 0)
+        return orjson.dumps(obj, option=option).decode('utf-8')
+    if _PRETTY_JSON:
+        return json.dumps(obj, indent=2)
+    return json.dumps(obj, separators=(',', ':'))
+
+
 # Configure logging
 logging.basicConfig(
     level=os.getenv("LOG_LEVEL", "INFO"),
@@ -40,8 +59,18 @@ logger = logging.getLogger("converse-enhanced-mcp")
 # Create server instance
 server = Server("converse-enhanced")
 
-# Global API manager instance
-api_manager = None
+# API manager built once in main(); handler tasks inherit it from main's context
+_manager_var: ContextVar[OptimizedAPIManager] = ContextVar("api_manager")
+
+# Per tool, keyed by the state it was built from: the rendered list_models JSON
+# and the get_status report minus its timestamp
+_rendered: Dict[str, Tuple[tuple, Any]] = {}
+
+
+def _state_key(api_manager: OptimizedAPIManager) -> tuple:
+    """Changes whenever anything shown by list_models or get_status changes"""
+    ollama = api_manager.ollama_manager
+    return (api_manager.state_version, ollama.state_version, ollama.is_available)
 
 
 @server.list_tools()
@@ -97,19 +126,46 @@ async def list_tools() -> list[types.Tool]:
                 "type": "object",
                 "properties": {}
             }
+        ),
+        types.Tool(
+            name="pull_ollama_model",
+            description="Download an Ollama model, streaming progress as log messages",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "model": {
+                        "type": "string",
+                        "description": "The model to pull (e.g., 'llama3.2', 'codellama:7b')"
+                    }
+                },
+                "required": ["model"]
+            }
         )
     ]
 
 
+async def _send_progress(message: str):
+    """Push a progress line to the client; progress is best-effort"""
+    try:
+        await server.request_context.session.send_log_message(
+            level="info",
+            data=message,
+            logger="converse-enhanced"
+        )
+    except Exception as e:
+        logger.debug(f"Could not send progress: {e}")
+
+
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> Sequence[types.TextContent]:
     """Handle tool calls"""
-    global api_manager
-
-    # Ensure API manager is initialized
+    api_manager = _manager_var.get(None)
     if api_manager is None:
-        api_manager = OptimizedAPIManager()
-        logger.info(f"Initialized API manager with {len(api_manager.providers)} providers")
+        # main() sets the manager before serving, so this only happens outside it
+        return [types.TextContent(
+            type="text",
+            text="Error: Server not initialized"
+        )]
 
     try:
         if name == "chat":
@@ -158,45 +214,59 @@ async def call_tool(name: str, arguments: dict) -> Sequence[types.TextContent]:
                 )]
 
         elif name == "list_models":
-            # List all available models
-            models_info = {
-                "ollama": {
-                    "status": "available" if api_manager.ollama_manager.is_available else "unavailable",
-                    "models": api_manager.ollama_manager.available_models
-                },
-                "api_providers": {}
-            }
+            # Reuse the last rendering unless the model lists or provider states changed
+            state = _state_key(api_manager)
+            cached = _rendered.get(name)
+            if cached is None or cached[0] != state:
+                # List all available models
+                models_info = {
+                    "ollama": {
+                        "status": "available" if api_manager.ollama_manager.is_available else "unavailable",
+                        "models": api_manager.ollama_manager.available_models
+                    },
+                    "api_providers": {}
+                }
 
-            # Add API provider models
-            for provider_name, provider in api_manager.providers.items():
-                if provider_name != "ollama" and provider.enabled:
-                    models_info["api_providers"][provider_name] = {
-                        "status": provider.status.value,
-                        "models": provider.models[:5] if provider.models else []  # Show first 5
-                    }
+                # Add API provider models
+                for provider_name, provider in api_manager.providers.items():
+                    if provider_name != "ollama" and provider.enabled:
+                        models_info["api_providers"][provider_name] = {
+                            "status": provider.status.value,
+                            "models": provider.models[:5] if provider.models else []  # Show first 5
+                        }
+
+                cached = _rendered[name] = (state, _dumps_json(models_info))
 
             return [types.TextContent(
                 type="text",
-                text=json.dumps(models_info, indent=2)
+                text=cached[1]
             )]
 
         elif name == "get_status":
-            # Get full status report
-            status = api_manager.get_status_report()
+            # Get full status report, rebuilding it only when something changed
+            state = _state_key(api_manager)
+            cached = _rendered.get(name)
+            if cached is None or cached[0] != state:
+                status = api_manager.get_status_report()
+                del status["timestamp"]
+                cached = _rendered[name] = (state, status)
+
+            status = {"timestamp": datetime.now().isoformat(), **cached[1]}
             return [types.TextContent(
                 type="text",
-                text=json.dumps(status, indent=2)
+                text=_dumps_json(status)
             )]
 
         elif name == "refresh_ollama":
             # Refresh Ollama models
             previous_count = len(api_manager.ollama_manager.available_models)
-            api_manager.ollama_manager.refresh_models()
+            await api_manager.ollama_manager.refresh_models_async()
             new_count = len(api_manager.ollama_manager.available_models)
 
             # Update the provider's model list
             if "ollama" in api_manager.providers:
                 api_manager.providers["ollama"].models = api_manager.ollama_manager.available_models
+                api_manager.mark_changed()
 
             result = {
                 "previous_count": previous_count,
@@ -207,7 +277,45 @@ async def call_tool(name: str, arguments: dict) -> Sequence[types.TextContent]:
 
             return [types.TextContent(
                 type="text",
-                text=json.dumps(result, indent=2)
+                text=_dumps_json(result)
+            )]
+
+        elif name == "pull_ollama_model":
+            model = arguments.get("model", "")
+            if not model:
+                return [types.TextContent(
+                    type="text",
+                    text="Error: Model is required"
+                )]
+
+            # Relay progress as it streams in, once per status and per 10% of a layer
+            last_update = {}
+            last_reported = (None, -1)
+            async for update in api_manager.ollama_manager.pull_model_stream(model):
+                last_update = update
+                status = update.get("status", "")
+                total = update.get("total")
+                decile = update.get("completed", 0) * 10 // total if total else -1
+                if (status, decile) != last_reported:
+                    last_reported = (status, decile)
+                    progress = f" ({decile * 10}%)" if decile >= 0 else ""
+                    await _send_progress(f"Pulling {model}: {status}{progress}")
+
+            # The manager refreshed its list after a successful pull
+            if "ollama" in api_manager.providers:
+                api_manager.providers["ollama"].models = api_manager.ollama_manager.available_models
+                api_manager.mark_changed()
+
+            result = {
+                "model": model,
+                "status": last_update.get("status", "error"),
+                "error": last_update.get("error"),
+                "models": api_manager.ollama_manager.available_models
+            }
+
+            return [types.TextContent(
+                type="text",
+                text=_dumps_json(result)
             )]
 
         else:
@@ -226,11 +334,11 @@ async def call_tool(name: str, arguments: dict) -> Sequence[types.TextContent]:
 
 async def main():
     """Main entry point for MCP server"""
-    global api_manager
-
     # Initialize API manager early
     logger.info("Initializing Converse-Enhanced MCP Server...")
     api_manager = OptimizedAPIManager()
+    _manager_var.set(api_manager)
+    await api_manager.ready()  # Concurrent provider probes
 
     # Log initialization status
     ollama_status = "available" if api_manager.ollama_manager.is_available else "unavailable"
@@ -245,17 +353,24 @@ async def main():
 
     logger.info(f"Available providers: {', '.join(available_providers)}")
 
+    # Readiness handshake for test harnesses; stdout is reserved for the protocol
+    print("READY", file=sys.stderr, flush=True)
+
     # Run the stdio server
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="converse-enhanced",
-                server_version="1.0.0",
-                capabilities={}
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="converse-enhanced",
+                    server_version="1.0.0",
+                    capabilities={}
+                )
             )
-        )
+    finally:
+        # Release pooled keep-alive connections on shutdown
+        await api_manager.aclose()
 
 
 if __name__ == "__main__":
@@ -1,63 +1,240 @@
 """
 Ollama Manager - Auto-detection and management of Ollama models
 """
+import os
+import re
+import json
+import asyncio
 import requests
+import httpx
 import logging
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+import time
+from pathlib import Path
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, AsyncIterator
+from datetime import datetime
+
+try:
+    import orjson  # Optional: C-accelerated JSON for /api/tags responses
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_PATH = '~/.converse/ollama_cache.json'
+
+# Name keywords per capability, matched as plain substrings of the lowercased model name
+_CAP_KEYWORDS = {
+    'code': ('code', 'coder', 'starcoder', 'deepseek-coder'),
+    'vision': ('vision', 'llava', 'bakllava', 'moondream'),
+    'large_context': ('32k', '64k', '128k', '100k'),
+    'multilingual': ('qwen', 'yi', 'solar', 'gemma'),
+    'embedding': ('embed', 'bge', 'nomic'),
+}
+# One alternation per capability, compiled once so detection is a C-level search
+_CAP_PATTERNS = {
+    cap: re.compile('|'.join(map(re.escape, keywords)))
+    for cap, keywords in _CAP_KEYWORDS.items()
+}
+
+# Punctuation-stripping tables for fuzzy name variations, tried in this order
+_VARIATION_TABLES = tuple(str.maketrans('', '', ch) for ch in '.-_')
+
+
+def _loads_json(data: bytes):
+    """Parse JSON bytes, preferring orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class OllamaManager:
     """Manages Ollama model auto-detection and availability"""
 
-    def __init__(self, host: str = 'http://localhost:11434'):
+    def __init__(self, host: str = 'http://localhost:11434', client: Optional[httpx.AsyncClient] = None):
         self.host = host
         self.available_models: List[str] = []
         self.model_details: Dict[str, Any] = {}
-        self.last_refresh: Optional[datetime] = None
-        self.refresh_interval = timedelta(minutes=5)  # Auto-refresh every 5 minutes
+        self.last_refresh: Optional[datetime] = None  # Wall clock, for display
+        self._last_refresh_mono: Optional[float] = None  # time.monotonic(), for staleness checks
+        self._refresh_interval_s = 300.0  # Auto-refresh every 5 minutes
         self.is_available = False
+        # Bumped whenever the model list changes, so callers can reuse rendered views
+        self._state_version = 0
+        self._rebuild_indices()
+
+        # Validator from the last /api/tags response; a 304 skips re-parsing the list
+        self._etag: Optional[str] = None
+        # Single-flight guard so concurrent callers share one /api/tags request
+        self._refresh_lock = asyncio.Lock()
+        # Completed refresh attempts, so callers that waited on the lock reuse the result
+        self._refresh_attempts = 0
+
+        # Non-blocking client for calls made from the MCP server's event loop;
+        # callers may pass a shared client so all Ollama traffic reuses its keep-alive pool
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=4)
+        )
+
+        # Last known model list on disk, served while a fresh one is fetched
+        self.cache_path = Path(os.getenv('CONVERSE_OLLAMA_CACHE_PATH', DEFAULT_CACHE_PATH)).expanduser()
+        # Air-gapped mode: never contact the Ollama API, serve the disk cache only
+        self.remote_disabled = os.getenv('CONVERSE_DISABLE_OLLAMA_REMOTE') == '1'
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # Initial detection: stale-while-revalidate when a cached list exists
+        cached = self._load_cache_from_disk()
+        if not self.remote_disabled:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+
+            if loop is not None:
+                # Never block a running loop; callers that need the list await refresh_models_async()
+                self._refresh_task = loop.create_task(self.refresh_models_async())
+            elif not cached:
+                self.refresh_models()  # Nothing to serve yet, detect now
+            # Otherwise should_refresh() revalidates once the cached list goes stale
+
+    @property
+    def state_version(self) -> int:
+        """Changes whenever the model list changes"""
+        return self._state_version
+
+    def _load_cache_from_disk(self) -> bool:
+        """Populate the model list from the disk cache; True if anything was loaded"""
+        try:
+            cache = _loads_json(self.cache_path.read_bytes())
+            self.available_models = list(cache['models'])
+            self.model_details = dict(cache['details'])
+            last_sync = datetime.fromisoformat(cache['last_sync'])
+            self._etag = cache.get('etag')
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f'⚠️ Ignoring unreadable Ollama model cache {self.cache_path}: {e}')
+            return False
 
-        # Initial detection
-        self.refresh_models()
+        self._rebuild_indices()
+        self.is_available = bool(self.available_models)
+        # Carry the cache's age over to the monotonic clock
+        age = max((datetime.now() - last_sync).total_seconds(), 0.0)
+        self.last_refresh = last_sync
+        self._last_refresh_mono = time.monotonic() - age
+        logger.info(f'Loaded {len(self.available_models)} cached Ollama models from {self.cache_path}')
+        return True
+
+    def _save_cache_to_disk(self):
+        """Atomically write the current model list to the disk cache"""
+        cache = {
+            'models': self.available_models,
+            'details': self.model_details,
+            'last_sync': self.last_refresh.isoformat(),
+            'etag': self._etag
+        }
+        tmp_path = self.cache_path.with_name(f'{self.cache_path.name}.{os.getpid()}.tmp')
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f'⚠️ Could not write Ollama model cache {self.cache_path}: {e}')
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def _store_models(self, data: Dict[str, Any]) -> List[str]:
+        """Record the models listed in an /api/tags response"""
+        models_data = data.get('models', [])
+
+        # Extract model names and store details
+        self.available_models = []
+        self.model_details = {}
+
+        for model in models_data:
+            model_name = model.get('name', '')
+            if model_name:
+                self.available_models.append(model_name)
+                self.model_details[model_name] = {
+                    'size': model.get('size', 0),
+                    'modified': model.get('modified_at', ''),
+                    'family': model.get('details', {}).get('family', ''),
+                    'parameter_size': model.get('details', {}).get('parameter_size', ''),
+                    'quantization': model.get('details', {}).get('quantization_level', '')
+                }
+
+        self._rebuild_indices()
+        self.is_available = True
+        self._mark_refreshed()
+        self._save_cache_to_disk()
+
+        logger.info(f'✅ Ollama auto-detection: Found {len(self.available_models)} models')
+        logger.info(f'   Available models: {", ".join(self.available_models)}')
+
+        return self.available_models
+
+    def _apply_tags_payload(self, status_code: int, etag: Optional[str], content: bytes) -> List[str]:
+        """Apply an /api/tags response; shared by the sync and async refresh paths"""
+        if status_code == 304:
+            return self._mark_not_modified()
+        if status_code == 200:
+            self._etag = etag
+            return self._store_models(_loads_json(content))
+        logger.warning(f'⚠️ Ollama API returned status {status_code}')
+        self.is_available = False
+        return []
+
+    def _conditional_headers(self) -> Dict[str, str]:
+        """Request headers that let Ollama answer 304 when the list is unchanged"""
+        return {'If-None-Match': self._etag} if self._etag else {}
+
+    def _mark_not_modified(self) -> List[str]:
+        """Handle a 304: the cached list is still current"""
+        self.is_available = True
+        self._mark_refreshed()
+        return self.available_models
+
+    def _mark_refreshed(self):
+        """Record that the model list was just confirmed current"""
+        self.last_refresh = datetime.now()
+        self._last_refresh_mono = time.monotonic()
+
+    def _rebuild_indices(self):
+        """Rebuild the hash lookups used to resolve requested model names"""
+        self._state_version += 1
+        self._names_set = frozenset(self.available_models)
+        # Base name ('llama3.2' for 'llama3.2:latest') -> first model listed with it
+        self._base_index: Dict[str, str] = {}
+        for model in self.available_models:
+            self._base_index.setdefault(model.split(':')[0], model)
+        # Fresh resolution cache per model list, so a refresh never serves stale names
+        self._resolve = lru_cache(maxsize=256)(self._resolve_uncached)
+
+        # Size filters per limit, computed once per model list
+        self._models_within = lru_cache(maxsize=32)(self._models_within_uncached)
+        # Smallest model with a known size (the first listed wins ties)
+        smallest = min(
+            self.model_details.items(),
+            key=lambda item: item[1].get('size', float('inf')),
+            default=None
+        )
+        self._smallest_model = (
+            smallest[0] if smallest and smallest[1].get('size', float('inf')) < float('inf') else None
+        )
 
     def refresh_models(self) -> List[str]:
         """Auto-detect available Ollama models"""
+        if self.remote_disabled:
+            return self.available_models
+
         try:
-            response = requests.get(f'{self.host}/api/tags', timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                models_data = data.get('models', [])
-
-                # Extract model names and store details
-                self.available_models = []
-                self.model_details = {}
-
-                for model in models_data:
-                    model_name = model.get('name', '')
-                    if model_name:
-                        self.available_models.append(model_name)
-                        self.model_details[model_name] = {
-                            'size': model.get('size', 0),
-                            'modified': model.get('modified_at', ''),
-                            'family': model.get('details', {}).get('family', ''),
-                            'parameter_size': model.get('details', {}).get('parameter_size', ''),
-                            'quantization': model.get('details', {}).get('quantization_level', '')
-                        }
-
-                self.is_available = True
-                self.last_refresh = datetime.now()
-
-                logger.info(f'✅ Ollama auto-detection: Found {len(self.available_models)} models')
-                logger.info(f'   Available models: {", ".join(self.available_models)}')
-
-                return self.available_models
-            else:
-                logger.warning(f'⚠️ Ollama API returned status {response.status_code}')
-                self.is_available = False
-                return []
+            response = requests.get(f'{self.host}/api/tags', headers=self._conditional_headers(), timeout=5)
+            return self._apply_tags_payload(response.status_code, response.headers.get('ETag'), response.content)
 
         except requests.exceptions.ConnectionError:
             logger.warning('⚠️ Ollama not running (connection refused)')
@@ -72,65 +249,58 @@ class OllamaManager:
             self.is_available = False
             return []
 
-    def should_refresh(self) -> bool:
-        """Check if models list should be refreshed"""
-        if not self.last_refresh:
-            return True
-        return datetime.now() - self.last_refresh > self.refresh_interval
-
-    def is_model_available(self, model_name: str) -> bool:
-        """Check if a model is available in Ollama"""
-        # Refresh if needed
-        if self.should_refresh():
-            self.refresh_models()
-
-        if not self.available_models:
-            return False
+    async def refresh_models_async(self) -> List[str]:
+        """Auto-detect available Ollama models without blocking the event loop"""
+        if self.remote_disabled:
+            return self.available_models
 
-        # Clean up the requested name
-        clean_name = model_name.lower().strip()
+        started_from = self._refresh_attempts
+        async with self._refresh_lock:
+            # Another caller refreshed while we waited for the lock; reuse its result
+            if self._refresh_attempts != started_from:
+                return self.available_models if self.is_available else []
 
-        # Remove common prefixes
-        for prefix in ['ollama/', 'ollama:', 'local/', 'local:']:
-            if clean_name.startswith(prefix):
-                clean_name = clean_name[len(prefix):]
+            try:
+                response = await self._client.get(
+                    f'{self.host}/api/tags', headers=self._conditional_headers(), timeout=5
+                )
+                return self._apply_tags_payload(response.status_code, response.headers.get('ETag'), response.content)
 
-        # Direct match
-        if clean_name in self.available_models:
-            return True
+            except httpx.ConnectError:
+                logger.warning('⚠️ Ollama not running (connection refused)')
+                self.is_available = False
+                return []
+            except httpx.TimeoutException:
+                logger.warning('⚠️ Ollama API timeout')
+                self.is_available = False
+                return []
+            except Exception as e:
+                logger.error(f'❌ Failed to detect Ollama models: {e}')
+                self.is_available = False
+                return []
+            finally:
+                self._refresh_attempts += 1
 
-        # Check with :latest tag
-        if f'{clean_name}:latest' in self.available_models:
+    def should_refresh(self) -> bool:
+        """Check if models list should be refreshed"""
+        if self.remote_disabled:
+            return False
+        if self._last_refresh_mono is None:
             return True
+        return time.monotonic() - self._last_refresh_mono > self._refresh_interval_s
 
-        # Check if it's a base name that matches
-        base_name = clean_name.split(':')[0]
-        for model in self.available_models:
-            if model.startswith(f'{base_name}:') or model == base_name:
-                return True
-
-        # Fuzzy matching for common variations
-        variations = [
-            clean_name.replace('.', ''),
-            clean_name.replace('-', ''),
-            clean_name.replace('_', ''),
-            clean_name.replace('.', '-'),
-            clean_name.replace('-', '.'),
-        ]
-
-        for variant in variations:
-            if variant in self.available_models:
-                return True
-            for model in self.available_models:
-                if variant in model or model in variant:
-                    return True
+    def is_model_available(self, model_name: str, refresh: bool = True) -> bool:
+        """Check if a model is available in Ollama"""
+        return self.get_actual_model_name(model_name, refresh=refresh) is not None
 
-        return False
+    def get_actual_model_name(self, requested_name: str, refresh: bool = True) -> Optional[str]:
+        """Get the actual Ollama model name from requested name
 
-    def get_actual_model_name(self, requested_name: str) -> Optional[str]:
-        """Get the actual Ollama model name from requested name"""
+        Pass refresh=False when the list is kept fresh elsewhere, to skip the
+        blocking refresh a stale list would otherwise trigger.
+        """
         # Refresh if needed
-        if self.should_refresh():
+        if refresh and self.should_refresh():
             self.refresh_models()
 
         if not self.available_models:
@@ -144,31 +314,31 @@ class OllamaManager:
             if clean_name.startswith(prefix):
                 clean_name = clean_name[len(prefix):]
 
+        return self._resolve(clean_name)
+
+    def _resolve_uncached(self, clean_name: str) -> Optional[str]:
+        """Match a cleaned-up name against the installed models"""
         # Direct match
-        if clean_name in self.available_models:
+        if clean_name in self._names_set:
             return clean_name
 
         # With :latest tag
-        if f'{clean_name}:latest' in self.available_models:
+        if f'{clean_name}:latest' in self._names_set:
             return f'{clean_name}:latest'
 
         # Base name matching
-        base_name = clean_name.split(':')[0]
-        for model in self.available_models:
-            if model.startswith(f'{base_name}:'):
-                return model
-            if model == base_name:
-                return model
-
-        # Fuzzy matching
-        variations = [
-            clean_name.replace('.', ''),
-            clean_name.replace('-', ''),
-            clean_name.replace('_', ''),
-        ]
-
-        for variant in variations:
-            if variant in self.available_models:
+        model = self._base_index.get(clean_name.split(':')[0])
+        if model:
+            return model
+
+        # Fuzzy matching (ordered: the first matching variation wins)
+        tried = set()
+        for table in _VARIATION_TABLES:
+            variant = clean_name.translate(table)
+            if variant in tried:
+                continue
+            tried.add(variant)
+            if variant in self._names_set:
                 return variant
             for model in self.available_models:
                 if variant in model:
@@ -193,14 +363,15 @@ class OllamaManager:
         if max_size_gb is None:
             return self.available_models
 
-        max_size_bytes = max_size_gb * 1024 * 1024 * 1024
-        filtered = []
-
-        for model_name, details in self.model_details.items():
-            if details.get('size', 0) <= max_size_bytes:
-                filtered.append(model_name)
+        return list(self._models_within(max_size_gb))
 
-        return filtered
+    def _models_within_uncached(self, max_size_gb: float) -> tuple:
+        """Models no larger than max_size_gb, in listing order"""
+        max_size_bytes = max_size_gb * 1024 * 1024 * 1024
+        return tuple(
+            model_name for model_name, details in self.model_details.items()
+            if details.get('size', 0) <= max_size_bytes
+        )
 
     def get_model_capabilities(self, model_name: str) -> Dict[str, bool]:
         """Detect model capabilities based on name and family"""
@@ -218,25 +389,13 @@ class OllamaManager:
 
         name_lower = model_name.lower()
 
-        # Code capabilities
-        if any(x in name_lower for x in ['code', 'coder', 'starcoder', 'deepseek-coder']):
-            capabilities['code'] = True
-
-        # Vision capabilities
-        if any(x in name_lower for x in ['vision', 'llava', 'bakllava', 'moondream']):
-            capabilities['vision'] = True
-
-        # Large context
-        if any(x in name_lower for x in ['32k', '64k', '128k', '100k']):
-            capabilities['large_context'] = True
-
-        # Multilingual
-        if any(x in name_lower for x in ['qwen', 'yi', 'solar', 'gemma']):
-            capabilities['multilingual'] = True
+        capabilities.update(
+            (cap, pattern.search(name_lower) is not None)
+            for cap, pattern in _CAP_PATTERNS.items()
+        )
 
         # Embedding models
-        if any(x in name_lower for x in ['embed', 'bge', 'nomic']):
-            capabilities['embedding'] = True
+        if capabilities['embedding']:
             capabilities['chat'] = False  # Embedding models don't chat
 
         return capabilities
@@ -267,27 +426,23 @@ class OllamaManager:
             return None  # No fallback for vision tasks
 
         elif 'fast' in task_type_lower or 'quick' in task_type_lower:
-            # Prefer smaller, faster models
-            smallest_model = None
-            smallest_size = float('inf')
-            for model, details in self.model_details.items():
-                size = details.get('size', float('inf'))
-                if size < smallest_size:
-                    smallest_size = size
-                    smallest_model = model
-            return smallest_model
+            # Prefer smaller, faster models (tracked per refresh)
+            return self._smallest_model
 
         # Default to first available model
         return self.available_models[0] if self.available_models else None
 
-    def test_model(self, model_name: str, test_prompt: str = "Hello") -> bool:
+    async def test_model(self, model_name: str, test_prompt: str = "Hello") -> bool:
         """Test if a specific model actually works"""
         try:
-            actual_name = self.get_actual_model_name(model_name)
+            # Refresh without blocking the event loop, then resolve against the fresh list
+            if self.should_refresh():
+                await self.refresh_models_async()
+            actual_name = self.get_actual_model_name(model_name, refresh=False)
             if not actual_name:
                 return False
 
-            response = requests.post(
+            response = await self._client.post(
                 f'{self.host}/api/generate',
                 json={
                     'model': actual_name,
@@ -313,27 +468,63 @@ class OllamaManager:
             logger.error(f'❌ Model {model_name} test error: {e}')
             return False
 
-    def pull_model(self, model_name: str) -> bool:
-        """Pull a new model from Ollama library"""
+    async def pull_model_stream(self, model_name: str) -> AsyncIterator[Dict[str, Any]]:
+        """Pull a new model from Ollama library, yielding each progress update
+
+        Yields Ollama's JSON-lines progress objects as they arrive; a failed
+        pull ends with a {'status': 'error', 'error': ...} update.
+        """
+        succeeded = False
         try:
-            response = requests.post(
+            async with self._client.stream(
+                'POST',
                 f'{self.host}/api/pull',
-                json={'name': model_name, 'stream': False},
-                timeout=600  # Allow 10 minutes for download
-            )
-
-            if response.status_code == 200:
-                logger.info(f'✅ Successfully pulled model: {model_name}')
-                # Refresh the models list
-                self.refresh_models()
-                return True
-            else:
-                logger.error(f'❌ Failed to pull model {model_name}: {response.status_code}')
-                return False
+                json={'name': model_name, 'stream': True},
+                # No cap on the whole download, only on silence between updates
+                timeout=httpx.Timeout(60.0, connect=5.0)
+            ) as response:
+                if response.status_code != 200:
+                    logger.error(f'❌ Failed to pull model {model_name}: {response.status_code}')
+                    yield {'status': 'error', 'error': f'HTTP {response.status_code}'}
+                    return
+
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    update = _loads_json(line)
+                    if 'error' in update:
+                        logger.error(f'❌ Failed to pull model {model_name}: {update["error"]}')
+                        yield {'status': 'error', 'error': update['error']}
+                        return
+                    succeeded = update.get('status') == 'success'
+                    yield update
 
         except Exception as e:
             logger.error(f'❌ Error pulling model {model_name}: {e}')
-            return False
+            yield {'status': 'error', 'error': str(e)}
+            return
+
+        if succeeded:
+            logger.info(f'✅ Successfully pulled model: {model_name}')
+            # Refresh the models list
+            await self.refresh_models_async()
+        else:
+            logger.error(f'❌ Pull of {model_name} ended without success')
+            yield {'status': 'error', 'error': 'pull ended without success'}
+
+    async def pull_model(self, model_name: str) -> bool:
+        """Pull a new model from Ollama library"""
+        status = None
+        async for update in self.pull_model_stream(model_name):
+            status = update.get('status')
+        return status == 'success'
+
+    async def aclose(self):
+        """Cancel a pending background refresh and close the HTTP client unless it was shared with us"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        if self._owns_client:
+            await self._client.aclose()
 
 
 # Test the manager if run directly
@@ -5,83 +5,153 @@ Includes caching, parallel processing, and smart model selection
 """
 
 import asyncio
+import hashlib
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, wait
 from functools import lru_cache
-from typing import Dict, List, Optional, Tuple
+from itertools import islice
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
 import time
 import logging
+import httpx
+
+try:
+    import xxhash  # Optional: fast non-cryptographic hashing for cache keys
+except ImportError:
+    xxhash = None
+
+try:
+    import numpy as np  # Optional: vectorized best-model scoring
+except ImportError:
+    np = None
+
+try:
+    import tiktoken  # Optional: real BPE token counts for prompt truncation
+except ImportError:
+    tiktoken = None
 
 logger = logging.getLogger(__name__)
 
+# Recommended model per task type and cost tier; read-only so it can be shared freely
+_MODEL_RECS: Mapping[str, Mapping[str, str]] = MappingProxyType({task: MappingProxyType(tiers) for task, tiers in {
+    'code': {
+        'free': 'codellama:7b',
+        'low': 'gpt-3.5-turbo',
+        'medium': 'grok-code-fast-1',
+        'high': 'gpt-5'
+    },
+    'reasoning': {
+        'free': 'llama3.3:70b',
+        'low': 'o1-mini',
+        'medium': 'o3-mini',
+        'high': 'o3-pro'
+    },
+    'creative': {
+        'free': 'mistral:7b',
+        'low': 'claude-3.5-haiku-20241022',
+        'medium': 'claude-sonnet-4',
+        'high': 'claude-opus-4-1-20250805'
+    },
+    'general': {
+        'free': 'llama3.1:8b',
+        'low': 'gpt-3.5-turbo',
+        'medium': 'gemini-2.5-flash',
+        'high': 'gpt-5'
+    },
+    'vision': {
+        'free': 'llava:7b',
+        'low': 'gemini-2.0-flash',
+        'medium': 'gpt-4o',
+        'high': 'grok-2-vision-1212'
+    }
+}.items()})
+
+# Columns of a model's performance row
+_TOTAL, _SUCCESSES, _TOTAL_TIME, _AVG_TIME, _SUCCESS_RATE = range(5)
+
+
+def _key(prompt: Union[str, int]) -> int:
+    """Response cache key for a prompt, stable across processes unlike hash()"""
+    if isinstance(prompt, int):
+        return prompt  # Already a precomputed key
+    data = prompt.encode('utf-8')
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
 
 class ModelOptimizer:
     """Optimizations for model selection and response handling"""
 
-    def __init__(self, api_manager):
+    # Expired cache entries are swept after this many inserts
+    _SWEEP_EVERY = 64
+
+    def __init__(self, api_manager, cache_max: int = 1024):
         self.api_manager = api_manager
-        self._response_cache = {}
-        self._model_performance = {}
+        # LRU of prompt key -> (response, timestamp, ttl), capped at cache_max entries
+        self._response_cache: OrderedDict[int, Tuple[str, float, int]] = OrderedDict()
+        self._cache_max = cache_max
+        self._inserts_since_sweep = 0
+        # One row of performance columns per model, in first-seen order; a float64
+        # matrix (grown by doubling) when NumPy is installed, else a list of lists
+        self._perf_idx: Dict[str, int] = {}
+        self._perf = np.zeros((8, 5)) if np is not None else []
+
+    @property
+    def _model_performance(self) -> Dict[str, Dict[str, float]]:
+        """Per-model stats as dicts, for reporting"""
+        return {
+            model: {
+                'total_requests': int(self._perf[idx][_TOTAL]),
+                'successful_requests': int(self._perf[idx][_SUCCESSES]),
+                'total_response_time': float(self._perf[idx][_TOTAL_TIME]),
+                'average_response_time': float(self._perf[idx][_AVG_TIME]),
+                'success_rate': float(self._perf[idx][_SUCCESS_RATE])
+            }
+            for model, idx in self._perf_idx.items()
+        }
 
-    @lru_cache(maxsize=100)
     def select_model_for_task(self, task_type: str, cost_tier: str = 'medium') -> str:
         """
         Smart model selection based on task type and cost constraints
         """
-        model_recommendations = {
-            'code': {
-                'free': 'codellama:7b',
-                'low': 'gpt-3.5-turbo',
-                'medium': 'grok-code-fast-1',
-                'high': 'gpt-5'
-            },
-            'reasoning': {
-                'free': 'llama3.3:70b',
-                'low': 'o1-mini',
-                'medium': 'o3-mini',
-                'high': 'o3-pro'
-            },
-            'creative': {
-                'free': 'mistral:7b',
-                'low': 'claude-3.5-haiku-20241022',
-                'medium': 'claude-sonnet-4',
-                'high': 'claude-opus-4-1-20250805'
-            },
-            'general': {
-                'free': 'llama3.1:8b',
-                'low': 'gpt-3.5-turbo',
-                'medium': 'gemini-2.5-flash',
-                'high': 'gpt-5'
-            },
-            'vision': {
-                'free': 'llava:7b',
-                'low': 'gemini-2.0-flash',
-                'medium': 'gpt-4o',
-                'high': 'grok-2-vision-1212'
-            }
-        }
-
-        task_type = task_type.lower()
-        if task_type not in model_recommendations:
-            task_type = 'general'
-
-        return model_recommendations[task_type].get(cost_tier, 'llama3.1:8b')
+        return _MODEL_RECS.get(task_type.lower(), _MODEL_RECS['general']).get(cost_tier, 'llama3.1:8b')
 
     async def query_models_parallel(self, prompt: str, models: List[str], timeout: int = 30) -> Dict[str, str]:
         """
         Query multiple models in parallel and return all responses
         """
-        tasks = []
-        for model in models:
-            task = asyncio.create_task(self._query_single_model(model, prompt, timeout))
-            tasks.append((model, task))
+        if not models:
+            return {}
+
+        tasks = {
+            asyncio.create_task(self._query_single_model(model, prompt, timeout)): model
+            for model in models
+        }
+
+        # Drive every query at once under one hard deadline for the whole batch
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=timeout * 1.1)
+        finally:
+            for task in tasks:
+                task.cancel()  # No-op for finished tasks; stops stragglers on timeout or cancellation
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
 
         results = {}
-        for model, task in tasks:
-            try:
-                response = await task
-                results[model] = response
-            except Exception as e:
+        for task, model in tasks.items():
+            if task in pending:
+                results[model] = f"Error: Model {model} timed out after {timeout}s"
+                logger.warning(f"Failed to query {model}: timed out")
+            elif task.exception() is not None:
+                e = task.exception()
                 results[model] = f"Error: {str(e)}"
                 logger.warning(f"Failed to query {model}: {e}")
+            else:
+                results[model] = task.result()
 
         return results
 
@@ -109,72 +179,113 @@ class ModelOptimizer:
                 logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay}s...")
                 time.sleep(delay)
 
-    def cache_response(self, prompt_hash: str, response: str, ttl: int = 300):
+    async def retry_with_backoff_async(self, coro_factory, max_retries: int = 3,
+                                       initial_delay: float = 1.0, jitter: bool = True):
+        """
+        Retry an async call with exponential backoff without blocking the event loop
+
+        coro_factory is called once per attempt, since a coroutine can only be awaited once.
+        Jitter adds up to half the delay at random so concurrent callers don't retry in lockstep.
+        """
+        for attempt in range(max_retries):
+            try:
+                return await coro_factory()
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    raise
+                delay = initial_delay * (2 ** attempt)
+                if jitter:
+                    delay += random.uniform(0, delay / 2)
+                logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f}s...")
+                await asyncio.sleep(delay)
+
+    def cache_response(self, prompt: Union[str, int], response: str, ttl: int = 300):
         """
         Cache a response with TTL (time-to-live)
+        Accepts the raw prompt or a key precomputed with _key()
         """
-        self._response_cache[prompt_hash] = {
-            'response': response,
-            'timestamp': time.time(),
-            'ttl': ttl
-        }
+        key = _key(prompt)
+        self._response_cache[key] = (response, time.time(), ttl)
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > self._cache_max:
+            self._response_cache.popitem(last=False)  # Evict the least recently used entry
 
-    def get_cached_response(self, prompt_hash: str) -> Optional[str]:
+        self._inserts_since_sweep += 1
+        if self._inserts_since_sweep >= self._SWEEP_EVERY:
+            self._sweep_expired()
+
+    def get_cached_response(self, prompt: Union[str, int]) -> Optional[str]:
         """
         Get a cached response if still valid
         """
-        if prompt_hash in self._response_cache:
-            cache_entry = self._response_cache[prompt_hash]
-            if time.time() - cache_entry['timestamp'] < cache_entry['ttl']:
-                logger.info(f"Cache hit for prompt hash: {prompt_hash}")
-                return cache_entry['response']
+        key = _key(prompt)
+        if key in self._response_cache:
+            response, timestamp, ttl = self._response_cache[key]
+            if time.time() - timestamp < ttl:
+                logger.info(f"Cache hit for prompt key: {key:016x}")
+                self._response_cache.move_to_end(key)
+                return response
             else:
                 # Remove expired entry
-                del self._response_cache[prompt_hash]
+                del self._response_cache[key]
         return None
 
+    def _sweep_expired(self):
+        """Drop expired entries that were never looked up again"""
+        now = time.time()
+        expired = [key for key, (_, timestamp, ttl) in self._response_cache.items()
+                   if now - timestamp >= ttl]
+        for key in expired:
+            del self._response_cache[key]
+        self._inserts_since_sweep = 0
+
     def track_model_performance(self, model: str, response_time: float, success: bool):
         """
         Track performance metrics for each model
         """
-        if model not in self._model_performance:
-            self._model_performance[model] = {
-                'total_requests': 0,
-                'successful_requests': 0,
-                'total_response_time': 0,
-                'average_response_time': 0,
-                'success_rate': 0
-            }
-
-        stats = self._model_performance[model]
-        stats['total_requests'] += 1
+        idx = self._perf_idx.get(model)
+        if idx is None:
+            idx = self._perf_idx[model] = len(self._perf_idx)
+            if np is None:
+                self._perf.append([0.0] * 5)
+            elif idx == len(self._perf):
+                self._perf = np.vstack([self._perf, np.zeros_like(self._perf)])
+
+        stats = self._perf[idx]  # A view when NumPy-backed, so updates land in place
+        stats[_TOTAL] += 1
         if success:
-            stats['successful_requests'] += 1
-            stats['total_response_time'] += response_time
+            stats[_SUCCESSES] += 1
+            stats[_TOTAL_TIME] += response_time
 
-        stats['success_rate'] = stats['successful_requests'] / stats['total_requests']
-        if stats['successful_requests'] > 0:
-            stats['average_response_time'] = stats['total_response_time'] / stats['successful_requests']
+        stats[_SUCCESS_RATE] = stats[_SUCCESSES] / stats[_TOTAL]
+        if stats[_SUCCESSES] > 0:
+            stats[_AVG_TIME] = stats[_TOTAL_TIME] / stats[_SUCCESSES]
 
     def get_best_performing_model(self, min_requests: int = 5) -> Optional[str]:
         """
         Get the best performing model based on success rate and response time
         """
-        eligible_models = {
-            model: stats for model, stats in self._model_performance.items()
-            if stats['total_requests'] >= min_requests
-        }
-
-        if not eligible_models:
-            return None
+        models = list(self._perf_idx)
 
         # Score = success_rate * 0.7 + (1 / (1 + avg_response_time)) * 0.3
+        if np is not None:
+            perf = self._perf[:len(models)]
+            eligible = np.flatnonzero(perf[:, _TOTAL] >= min_requests)
+            if eligible.size == 0:
+                return None
+            scores = (perf[eligible, _SUCCESS_RATE] * 0.7 +
+                      (1 / (1 + perf[eligible, _AVG_TIME])) * 0.3)
+            # argmax keeps the first of equal scores, like the strict > scan
+            return models[int(eligible[np.argmax(scores)])]
+
         best_model = None
         best_score = -1
 
-        for model, stats in eligible_models.items():
-            score = (stats['success_rate'] * 0.7 +
-                    (1 / (1 + stats['average_response_time'])) * 0.3)
+        for model, stats in zip(models, self._perf):
+            if stats[_TOTAL] < min_requests:
+                continue
+            score = (stats[_SUCCESS_RATE] * 0.7 +
+                    (1 / (1 + stats[_AVG_TIME])) * 0.3)
             if score > best_score:
                 best_score = score
                 best_model = model
@@ -191,6 +302,13 @@ class ConnectionPool:
         self.max_connections = max_connections
         self.connections = {}
         self.available = asyncio.Semaphore(max_connections)
+        # One keep-alive pool shared by every provider; httpx clients are safe to share
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections * 4,
+                max_keepalive_connections=max_connections
+            )
+        )
 
     async def get_connection(self, provider: str):
         """Get or create a connection for a provider"""
@@ -201,32 +319,75 @@ class ConnectionPool:
 
     async def _create_connection(self, provider: str):
         """Create a new connection for a provider"""
-        # Implementation would create actual HTTP client
-        return f"Connection to {provider}"
+        return self._client
 
     async def close_all(self):
         """Close all connections"""
-        for connection in self.connections.values():
-            # Close actual connections
-            pass
+        await self._client.aclose()
         self.connections.clear()
 
 
+_TRUNCATION_MARKER = "\n... [truncated for length]"
+# How long the first prompt waits for the tokenizer; later prompts never wait
+_ENCODING_FIRST_WAIT = 0.5
+
+_encoding_lock = threading.Lock()
+_encoding_future: Optional[Future] = None
+
+
+def _load_encoding(future: Future):
+    """Load cl100k_base into future; None if tiktoken cannot load it"""
+    try:
+        future.set_result(tiktoken.get_encoding("cl100k_base"))
+    except Exception as e:  # e.g. the BPE file cannot be downloaded offline
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+        future.set_result(None)
+
+
+def _get_encoding():
+    """The cl100k_base tokenizer once loaded; None while it loads or if tiktoken is missing or failed
+
+    get_encoding may download its BPE file on first use, so it runs once on a
+    daemon thread. Only the first caller waits, briefly; until the load finishes,
+    prompts are measured in characters.
+    """
+    global _encoding_future
+    if tiktoken is None:
+        return None
+    with _encoding_lock:
+        first = _encoding_future is None
+        if first:
+            _encoding_future = Future()
+            threading.Thread(target=_load_encoding, args=(_encoding_future,),
+                             name="tiktoken-load", daemon=True).start()
+    if first:
+        wait([_encoding_future], timeout=_ENCODING_FIRST_WAIT)
+    return _encoding_future.result() if _encoding_future.done() else None
+
+
 def optimize_prompt(prompt: str, max_tokens: int = 4000) -> str:
     """
     Optimize prompt to fit within token limits while preserving meaning
     """
-    # Simple truncation for now - could implement smarter compression
+    encoding = _get_encoding()
+    if encoding is not None:
+        # Count real tokens and cut on a token boundary, leaving room for the marker
+        ids = encoding.encode(prompt, disallowed_special=())
+        if len(ids) > max_tokens:
+            return encoding.decode(ids[:max_tokens - 20]) + _TRUNCATION_MARKER
+        return prompt
+
+    # Without a tokenizer, keep the original character budget
     if len(prompt) > max_tokens:
-        return prompt[:max_tokens-100] + "\n... [truncated for length]"
+        return prompt[:max_tokens - 100] + _TRUNCATION_MARKER
     return prompt
 
 
-def batch_requests(requests: List[Dict], batch_size: int = 5) -> List[List[Dict]]:
+def batch_requests(requests: Iterable[Dict], batch_size: int = 5) -> Iterator[List[Dict]]:
     """
     Batch multiple requests for efficient processing
+    Yields one batch at a time, so only the current batch is held in memory
     """
-    batches = []
-    for i in range(0, len(requests), batch_size):
-        batches.append(requests[i:i + batch_size])
-    return batches
\ No newline at end of file
+    it = iter(requests)
+    while batch := list(islice(it, batch_size)):
+        yield batch
\ No newline at end of file
@@ -6,14 +6,28 @@ NO PLACEHOLDER RESPONSES - Fail cleanly with helpful errors
 """
 
 import os
+import re
 import json
+import heapq
+import asyncio
+import itertools
 import logging
 import time
-from typing import Dict, List, Optional, Any, Tuple
+import random
+from contextlib import asynccontextmanager
+from functools import cached_property
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, Sequence, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 import httpx
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+try:
+    import h2  # Optional: lets the shared client negotiate HTTP/2 (pip install httpx[http2])
+except ImportError:
+    h2 = None
 
 # Import our new OllamaManager
 from ollama_manager import OllamaManager
@@ -21,62 +35,61 @@ from ollama_manager import OllamaManager
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Exhaustive Model Configuration Dictionary
-PROVIDER_MODELS = {
+# Provider specs: API endpoint, API-key environment variable, price per 1k tokens and
+# models, in fallback order. Kept as JSON so the table is parsed in one pass at import.
+_PROVIDER_MODELS_JSON = """
+{
     "ollama": {
         "api_endpoint": "http://localhost:11434",
+        "env_key": null,
+        "cost_per_1k_tokens": 0.0,
         "models": [
-            # Llama Series
-            "llama3.3:70b", "llama3.2-vision:11b", "llama3.2-vision:90b",
-            "llama3.1:8b", "llama3.1:70b", "llama3:8b", "llama3:70b",
-            "llama2:7b", "llama2:13b", "llama2:70b",
-            # Mistral Series
-            "mistral:7b", "mistral-small:3b", "mistral-small:3.1",
-            "mistral-large:2", "mixtral:8x7b", "mixtral:8x22b",
-            # Qwen Series
-            "qwen2.5:7b", "qwen2.5:14b", "qwen2.5:32b", "qwen2.5:72b", "qwen2.5-coder",
-            # Google Models
-            "gemma2:2b", "gemma2:9b", "gemma2:27b", "gemma:2b", "gemma:7b",
-            # Microsoft
-            "phi3:mini", "phi3:medium", "phi-3.5:3.8b",
-            # Specialized Models
-            "codellama:7b", "codellama:13b", "codellama:34b",
-            "starcoder:7b", "deepseek-coder:6.7b", "deepseek-coder:33b",
-            # Multimodal
-            "llava:7b", "llava:13b", "llava:34b",
-            # Small Models
-            "smollm2:135m", "smollm2:360m", "smollm2:1.7b",
+            "llama3.3:70b", "llama3.2-vision:11b", "llama3.2-vision:90b", "llama3.1:8b",
+            "llama3.1:70b", "llama3:8b", "llama3:70b", "llama2:7b", "llama2:13b", "llama2:70b",
+            "mistral:7b", "mistral-small:3b", "mistral-small:3.1", "mistral-large:2",
+            "mixtral:8x7b", "mixtral:8x22b", "qwen2.5:7b", "qwen2.5:14b", "qwen2.5:32b",
+            "qwen2.5:72b", "qwen2.5-coder", "gemma2:2b", "gemma2:9b", "gemma2:27b", "gemma:2b",
+            "gemma:7b", "phi3:mini", "phi3:medium", "phi-3.5:3.8b", "codellama:7b", "codellama:13b",
+            "codellama:34b", "starcoder:7b", "deepseek-coder:6.7b", "deepseek-coder:33b",
+            "llava:7b", "llava:13b", "llava:34b", "smollm2:135m", "smollm2:360m", "smollm2:1.7b"
         ]
     },
     "anthropic": {
         "api_endpoint": "https://api.anthropic.com/v1",
+        "env_key": "ANTHROPIC_API_KEY",
+        "cost_per_1k_tokens": 0.015,
         "models": [
-            "claude-opus-4-1-20250805", "claude-opus-4", "claude-sonnet-4",
-            "claude-3.7-sonnet", "claude-3.5-sonnet-20241022", "claude-3.5-haiku-20241022",
-            "claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"
+            "claude-opus-4-1-20250805", "claude-opus-4", "claude-sonnet-4", "claude-3.7-sonnet",
+            "claude-3.5-sonnet-20241022", "claude-3.5-haiku-20241022", "claude-3-opus-20240229",
+            "claude-3-sonnet-20240229", "claude-3-haiku-20240307"
         ]
     },
     "openai": {
         "api_endpoint": "https://api.openai.com/v1",
+        "env_key": "OPENAI_API_KEY",
+        "cost_per_1k_tokens": 0.03,
         "models": [
-            "gpt-5", "gpt-5-mini", "gpt-5-nano", "gpt-5-chat",
-            "o3-pro", "o3", "o3-mini", "o1", "o1-mini",
-            "gpt-4.5", "gpt-4.1", "gpt-4.1-mini", "gpt-4o",
-            "gpt-4-turbo-2024-04-09", "gpt-4-turbo", "gpt-4-32k", "gpt-4",
-            "gpt-3.5-turbo", "gpt-3.5-turbo-16k", "gpt-3.5-turbo-instruct"
+            "gpt-5", "gpt-5-mini", "gpt-5-nano", "gpt-5-chat", "o3-pro", "o3", "o3-mini", "o1",
+            "o1-mini", "gpt-4.5", "gpt-4.1", "gpt-4.1-mini", "gpt-4o", "gpt-4-turbo-2024-04-09",
+            "gpt-4-turbo", "gpt-4-32k", "gpt-4", "gpt-3.5-turbo", "gpt-3.5-turbo-16k",
+            "gpt-3.5-turbo-instruct"
         ]
     },
     "google": {
         "api_endpoint": "https://generativelanguage.googleapis.com/v1",
+        "env_key": "GEMINI_API_KEY",
+        "cost_per_1k_tokens": 0.001,
         "models": [
-            "gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.5-flash-lite",
-            "gemini-2.5-flash-image", "gemini-2.5-pro-preview-tts",
-            "gemini-2.0-flash", "gemini-2.0-flash-lite",
-            "gemini-2.0-flash-preview-image-generation", "gemini-2.0-flash-live"
+            "gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.5-flash-image",
+            "gemini-2.5-pro-preview-tts", "gemini-2.0-flash", "gemini-2.0-flash-lite",
+            "gemini-2.0-flash-preview-image-generation", "gemini-2.0-flash-live", "gemini-pro",
+            "gemini-pro-vision"
         ]
     },
     "xai": {
         "api_endpoint": "https://api.x.ai/v1",
+        "env_key": "XAI_API_KEY",
+        "cost_per_1k_tokens": 0.02,
         "models": [
             "grok-4-0709", "grok-4-fast", "grok-4-fast-reasoning", "grok-4-fast-non-reasoning",
             "grok-3", "grok-3-mini", "grok-2-1212", "grok-2-vision-1212", "grok-2",
@@ -85,19 +98,37 @@ PROVIDER_MODELS = {
     },
     "perplexity": {
         "api_endpoint": "https://api.perplexity.ai",
+        "env_key": "PERPLEXITY_API_KEY",
+        "cost_per_1k_tokens": 0.005,
         "models": [
             "sonar", "sonar-pro", "sonar-reasoning", "sonar-reasoning-pro", "sonar-deep-research",
             "sonar-small", "sonar-medium", "sonar-small-chat", "sonar-medium-chat",
-            "sonar-small-online", "sonar-medium-online",
-            "pplx-7b-online", "pplx-70b-online", "pplx-7b-chat", "pplx-70b-chat"
+            "sonar-small-online", "sonar-medium-online", "pplx-7b-online", "pplx-70b-online",
+            "pplx-7b-chat", "pplx-70b-chat"
         ]
     }
 }
+"""
+
+# Exhaustive Model Configuration Dictionary
+PROVIDER_MODELS = json.loads(_PROVIDER_MODELS_JSON)
+# Static model lists are shared by every provider built from them, so freeze them
+for _spec in PROVIDER_MODELS.values():
+    _spec["models"] = tuple(_spec["models"])
+del _spec
+
+# Paid providers as (name, API-key env var, base URL, cost per 1k tokens, models, model set),
+# in fallback order; the set answers exact-name routing in O(1)
+_PROVIDER_SPECS = tuple(
+    (name, spec["env_key"], spec["api_endpoint"], spec["cost_per_1k_tokens"], spec["models"],
+     frozenset(spec["models"]))
+    for name, spec in PROVIDER_MODELS.items() if spec["env_key"]
+)
 
 # Helper function to get all available models for a provider
 def get_provider_models(provider_name):
-    """Returns list of model IDs for a specific provider"""
-    return PROVIDER_MODELS.get(provider_name, {}).get("models", [])
+    """Returns tuple of model IDs for a specific provider"""
+    return PROVIDER_MODELS.get(provider_name, {}).get("models", ())
 
 # Helper function to get latest/recommended models
 def get_recommended_models():
@@ -111,22 +142,60 @@ def get_recommended_models():
         "ollama": ["llama3.3:70b", "mistral-large:2", "qwen2.5:72b", "gemma2:27b"]
     }
 
-# Model aliases for backward compatibility
-MODEL_ALIASES = {
+# Model aliases for backward compatibility; read-only so it can be shared freely
+MODEL_ALIASES: Mapping[str, str] = MappingProxyType({
     "gemini-pro": "gemini-2.5-pro",
     "gemini-pro-vision": "gemini-2.5-flash",
     "claude-3-opus": "claude-opus-4-1-20250805",
     "claude-3-sonnet": "claude-sonnet-4",
     "gpt-4-vision-preview": "gpt-4o"
-}
-
-# Cost optimization tiers
-COST_TIERS = {
-    "free": ["ollama/*"],  # All Ollama models
-    "low": ["claude-3.5-haiku-20241022", "gpt-3.5-turbo", "gemini-2.5-flash-lite", "sonar-small"],
-    "medium": ["claude-sonnet-4", "gpt-5-mini", "gemini-2.5-flash", "sonar-pro"],
-    "high": ["claude-opus-4-1-20250805", "gpt-5", "gemini-2.5-pro", "grok-4-0709"]
-}
+})
+
+# Cost optimization tiers; read-only like the model tables
+COST_TIERS: Mapping[str, frozenset] = MappingProxyType({
+    "free": frozenset({"ollama/*"}),  # All Ollama models
+    "low": frozenset({"claude-3.5-haiku-20241022", "gpt-3.5-turbo", "gemini-2.5-flash-lite", "sonar-small"}),
+    "medium": frozenset({"claude-sonnet-4", "gpt-5-mini", "gemini-2.5-flash", "sonar-pro"}),
+    "high": frozenset({"claude-opus-4-1-20250805", "gpt-5", "gemini-2.5-pro", "grok-4-0709"})
+})
+
+# Default for all pooled requests: fail fast on connect and pool waits, allow slow generations
+CLIENT_TIMEOUT = httpx.Timeout(connect=2.0, read=60.0, write=10.0, pool=1.0)
+# Paid APIs answer faster than local generation, so give up on them sooner
+API_TIMEOUT = httpx.Timeout(connect=2.0, read=30.0, write=10.0, pool=1.0)
+# Seconds a probe result is trusted before the provider is re-probed in the background
+HEALTH_TTL = 15.0
+# Seconds to skip a provider that answered 429/503 without a usable Retry-After header
+RATE_LIMIT_BACKOFF = 300.0
+# Consecutive failures that open a paid provider's circuit, and seconds it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+# Retries after a connection failure, waiting TRANSIENT_BASE_DELAY * 2**attempt plus jitter
+TRANSIENT_RETRIES = 2
+TRANSIENT_BASE_DELAY = 0.25
+# Failures raised before a request reached the provider, so retrying cannot double-bill it
+_TRANSIENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Concurrent in-flight requests allowed per provider; excess requests wait their turn
+PROVIDER_CONCURRENCY = {"ollama": 20}
+DEFAULT_PROVIDER_CONCURRENCY = 6  # Paid APIs: stay under typical per-key burst limits
+# send_message priority for callers that don't pass one; lower values are served first
+DEFAULT_PRIORITY = 10
+
+# Model-name routing, checked in order; a match whose provider is not configured falls through
+_MODEL_ROUTES = (
+    ("anthropic", re.compile(r"claude|opus|sonnet")),
+    ("openai", re.compile(r"^(?:gpt|o3)|davinci")),
+    ("google", re.compile(r"gemini|bison")),
+    ("xai", re.compile(r"grok")),
+    ("perplexity", re.compile(r"pplx|sonar")),
+)
+
+# Ollama model families preferred per prompt shape, in order of preference
+_OLLAMA_FAST_PREFIXES = ("phi3", "llama3.2")  # Matched as name prefixes
+_OLLAMA_CODE_FAMILIES = ("codellama", "qwen2.5-coder")  # Matched as substrings
+_OLLAMA_LARGE_FAMILIES = ("qwen2.5-coder", "llama3.2")
+_CODE_PROMPT_RE = re.compile(r"code|function|class|def |import|programming|script")
 
 # APIManager alias will be set at the end of the file for compatibility
 
@@ -139,26 +208,105 @@ class ProviderStatus(Enum):
     DISABLED = "disabled"
 
 
-@dataclass
+class BreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class RateLimited(Exception):
+    """A provider answered 429/503; skip it for retry_after seconds"""
+
+    def __init__(self, provider: str, status_code: int, retry_after: float):
+        super().__init__(f"{provider} returned HTTP {status_code}, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return RATE_LIMIT_BACKOFF
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return RATE_LIMIT_BACKOFF
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _raise_for_status(provider: str, response: httpx.Response):
+    """raise_for_status, but surface rate limiting as RateLimited so callers fall back at once"""
+    if response.status_code in (429, 503):
+        raise RateLimited(provider, response.status_code,
+                          _parse_retry_after(response.headers.get("retry-after")))
+    response.raise_for_status()
+
+
+class _PrioritySlots:
+    """A semaphore whose waiters are admitted lowest priority value first, FIFO within a priority"""
+
+    def __init__(self, limit: int):
+        self._free = limit
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # Handed a slot just as we were cancelled: pass it on
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():  # Skip waiters that were cancelled while queued
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+@dataclass(slots=True)
 class ProviderConfig:
     name: str
     priority: int
     enabled: bool
     api_key: Optional[str]
     base_url: Optional[str]
-    models: List[str]
+    models: Sequence[str]  # PROVIDER_MODELS tuple, or Ollama's detected list
+    models_set: frozenset = frozenset()  # Paid providers: the listed model IDs, for exact-name routing
     cost_per_1k_tokens: float = 0.0  # Cost tracking
     is_free: bool = False
     fallback_on_error: bool = True
-    rate_limit_reset: Optional[datetime] = None
+    rate_limit_reset: float = 0.0  # time.monotonic() deadline; 0.0 when not rate limited
     status: ProviderStatus = ProviderStatus.NOT_CONFIGURED
     last_error: Optional[str] = None
     usage_count: int = 0
     tokens_used: int = 0
     total_cost: float = 0.0
+    all_models: Sequence[str] = ()  # Ollama: every known model, installed or not
 
 
-@dataclass
+@dataclass(slots=True)
 class UsageStats:
     """Track usage and cost savings"""
     total_requests: int = 0
@@ -172,17 +320,69 @@ class UsageStats:
     timestamp: datetime = field(default_factory=datetime.now)
 
 
+@dataclass(slots=True)
+class CircuitBreaker:
+    """Skip a failing provider for a cooldown, then let one trial request through"""
+    state: BreakerState = BreakerState.CLOSED
+    failure_count: int = 0
+    opened_at: float = 0.0  # time.monotonic() the circuit opened or the trial started
+    half_open_inflight: bool = False
+
+    def allow(self) -> bool:
+        if self.state is BreakerState.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < BREAKER_COOLDOWN:
+            # Still cooling down, or a trial request is already out
+            if self.state is BreakerState.OPEN or self.half_open_inflight:
+                return False
+        # One trial at a time; a trial that never reported back is replaced after a cooldown
+        self.state = BreakerState.HALF_OPEN
+        self.half_open_inflight = True
+        self.opened_at = now
+        return True
+
+    def record_success(self):
+        self.state = BreakerState.CLOSED
+        self.failure_count = 0
+        self.half_open_inflight = False
+
+    def record_failure(self):
+        self.failure_count += 1
+        if self.state is BreakerState.HALF_OPEN or self.failure_count >= BREAKER_FAILURE_THRESHOLD:
+            self.state = BreakerState.OPEN
+            self.opened_at = time.monotonic()
+        self.half_open_inflight = False
+
+
 class OptimizedAPIManager:
     """Manages multiple AI providers with Ollama-first priority"""
 
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, client: Optional[httpx.AsyncClient] = None):
         self.providers: Dict[str, ProviderConfig] = {}
         self.config_path = config_path or "api_config_optimized.json"
         self.usage_stats = UsageStats()
         self.user_preference: Optional[str] = None
-
-        # Initialize Ollama Manager for auto-detection
-        self.ollama_manager = OllamaManager()
+        # Bumped on every provider or usage change, so callers can reuse rendered reports
+        self._state_version = 0
+        # Bumped when a provider's status or enabled flag or the user preference changes
+        self._routing_version = 0
+        # respect_user_preference -> ((routing version, preference), ranked providers)
+        self._available_cache: Dict[bool, Tuple[tuple, List[ProviderConfig]]] = {}
+        # Earliest rate_limit_reset among rate-limited providers; inf when none are
+        self._next_rate_limit_reset = float('inf')
+
+        # Long-lived HTTP client shared by every provider call, so requests reuse
+        # connections (and TLS sessions) instead of re-handshaking; callers may pass their own
+        self._client = client or httpx.AsyncClient(
+            http2=h2 is not None,
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("HTTPX_MAX_CONNECTIONS", "200")),
+                max_keepalive_connections=int(os.getenv("HTTPX_MAX_KEEPALIVE_CONNECTIONS", "100")),
+                keepalive_expiry=30.0
+            ),
+            timeout=CLIENT_TIMEOUT
+        )
 
         # Load user preferences if they exist
         self.load_preferences()
@@ -190,11 +390,38 @@ class OptimizedAPIManager:
         # Initialize providers with CORRECT priorities
         self.initialize_providers()
 
-        # Test availability
-        self.test_provider_availability()
+        # Circuit breakers for paid providers; Ollama is local and cheap to retry
+        self._breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker() for name in self.providers if name != "ollama"
+        }
 
-        # Log initialization status
-        self.log_initialization_status()
+        # Availability probes run concurrently on first await of ready()
+        self._probe_task: Optional[asyncio.Task] = None
+        self._probed = False
+        # Provider name -> (status, time.monotonic()) as of its last probe
+        self._health_cache: Dict[str, Tuple[ProviderStatus, float]] = {}
+        self._health_tasks: Dict[str, asyncio.Task] = {}
+
+        # First installed Ollama model per preferred family, rebuilt when the model list changes
+        self._ollama_picks: Dict[Tuple[str, str], str] = {}
+        self._ollama_picks_version = -1
+
+        # Per-provider concurrency limits, created on first use
+        self._slots: Dict[str, _PrioritySlots] = {}
+
+    @property
+    def state_version(self) -> int:
+        """Changes whenever provider state or usage changes, so callers can reuse rendered reports"""
+        return self._state_version
+
+    def mark_changed(self):
+        """Record a provider change made outside the manager"""
+        self._state_version += 1
+
+    @cached_property
+    def ollama_manager(self) -> OllamaManager:
+        """Ollama auto-detection, sharing our connection pool; built by the first probe"""
+        return OllamaManager(host=self.providers["ollama"].base_url, client=self._client)
 
     def load_preferences(self):
         """Load user preferences from config"""
@@ -211,226 +438,164 @@ class OptimizedAPIManager:
         """Initialize all supported providers with CORRECT priorities"""
 
         # PRIORITY 1: Ollama (FREE and LOCAL) - ALWAYS FIRST
-        # Use auto-detected models from OllamaManager
-        ollama_models = self.ollama_manager.available_models if self.ollama_manager.is_available else []
-
+        # Enabled with its installed models once a probe finds it running
         self.providers["ollama"] = ProviderConfig(
             name="ollama",
             priority=1,  # HIGHEST PRIORITY
-            enabled=self.ollama_manager.is_available,
+            enabled=False,
             api_key=None,
-            base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-            models=ollama_models,  # Use auto-detected models
+            base_url=os.getenv("OLLAMA_BASE_URL", PROVIDER_MODELS["ollama"]["api_endpoint"]),
+            models=[],
             cost_per_1k_tokens=0.0,
             is_free=True,
-            status=ProviderStatus.AVAILABLE if self.ollama_manager.is_available else ProviderStatus.NOT_CONFIGURED
+            status=ProviderStatus.NOT_CONFIGURED
         )
 
-        # Other providers with LOWER priorities
+        # Other providers with LOWER priorities, in PROVIDER_MODELS order
         priority_counter = 10  # Start other providers at 10+
 
-        # Anthropic (often preferred for quality)
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        if anthropic_key:
-            self.providers["anthropic"] = ProviderConfig(
-                name="anthropic",
-                priority=priority_counter,
-                enabled=True,
-                api_key=anthropic_key,
-                base_url="https://api.anthropic.com/v1",
-                models=[
-                    # Claude 4 Series (2025)
-                    "claude-opus-4-1-20250805",  # Latest Opus 4.1 (August 2025)
-                    "claude-opus-4",             # Original Opus 4 (May 2025)
-                    "claude-sonnet-4",           # Sonnet 4 (May 2025)
-                    # Claude 3.7/3.5 Series (Still Available)
-                    "claude-3.7-sonnet",         # Extended thinking capabilities
-                    "claude-3.5-sonnet-20241022", # October 2024 update
-                    "claude-3.5-haiku-20241022",  # Fast, affordable
-                    # Legacy Claude 3 (for backward compatibility)
-                    "claude-3-opus-20240229",
-                    "claude-3-sonnet-20240229",
-                    "claude-3-haiku-20240307",
-                ],
-                cost_per_1k_tokens=0.015,  # Claude 3 Sonnet pricing
-                status=ProviderStatus.AVAILABLE
-            )
-            priority_counter += 1
-
-        # OpenAI
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if openai_key:
-            self.providers["openai"] = ProviderConfig(
-                name="openai",
-                priority=priority_counter,
-                enabled=True,
-                api_key=openai_key,
-                base_url="https://api.openai.com/v1",
-                models=[
-                    # GPT-5 Series (2025 - Latest)
-                    "gpt-5",                # Flagship model (registration required)
-                    "gpt-5-mini",           # Smaller variant
-                    "gpt-5-nano",           # Smallest variant
-                    "gpt-5-chat",           # Chat-optimized
-                    # O-Series Reasoning Models
-                    "o3-pro",               # Advanced reasoning (Pro/Team users)
-                    "o3",                   # Standard reasoning model
-                    "o3-mini",              # Cost-efficient reasoning
-                    "o1",                   # Previous gen reasoning
-                    "o1-mini",              # Previous gen mini
-                    # GPT-4 Series (Still Available)
-                    "gpt-4.5",              # Research preview
-                    "gpt-4.1",              # Coding specialized
-                    "gpt-4.1-mini",         # Fast, efficient
-                    "gpt-4o",               # Multimodal
-                    "gpt-4-turbo-2024-04-09",
-                    "gpt-4-turbo",
-                    "gpt-4-32k",
-                    "gpt-4",
-                    # GPT-3.5 Series
-                    "gpt-3.5-turbo",
-                    "gpt-3.5-turbo-16k",
-                    "gpt-3.5-turbo-instruct",
-                ],
-                cost_per_1k_tokens=0.03,  # GPT-4 pricing
-                status=ProviderStatus.AVAILABLE
-            )
-            priority_counter += 1
-
-        # Google Gemini
-        gemini_key = os.getenv("GEMINI_API_KEY")
-        if gemini_key:
-            self.providers["google"] = ProviderConfig(
-                name="google",
-                priority=priority_counter,
-                enabled=True,
-                api_key=gemini_key,
-                base_url="https://generativelanguage.googleapis.com/v1",
-                models=[
-                    # Gemini 2.5 Series (Latest - 2025)
-                    "gemini-2.5-pro",           # State-of-the-art thinking model
-                    "gemini-2.5-flash",         # Best price-performance
-                    "gemini-2.5-flash-lite",    # Most cost-effective
-                    "gemini-2.5-flash-image",   # Image generation (preview)
-                    "gemini-2.5-pro-preview-tts", # Text-to-speech
-                    # Gemini 2.0 Series (Current)
-                    "gemini-2.0-flash",         # Multimodal with tool use
-                    "gemini-2.0-flash-lite",    # Optimized for efficiency
-                    "gemini-2.0-flash-preview-image-generation",
-                    "gemini-2.0-flash-live",    # Low-latency voice/video
-                    # Legacy names for compatibility
-                    "gemini-pro",  # Maps to gemini-2.5-pro
-                    "gemini-pro-vision",  # Maps to gemini-2.5-flash
-                ],
-                cost_per_1k_tokens=0.001,  # Gemini Pro pricing
-                status=ProviderStatus.AVAILABLE
-            )
-            priority_counter += 1
-
-        # XAI (Grok)
-        xai_key = os.getenv("XAI_API_KEY")
-        if xai_key:
-            self.providers["xai"] = ProviderConfig(
-                name="xai",
+        for name, env_key, base_url, cost, models, models_set in _PROVIDER_SPECS:
+            api_key = os.getenv(env_key)
+            if not api_key:
+                continue
+            self.providers[name] = ProviderConfig(
+                name=name,
                 priority=priority_counter,
                 enabled=True,
-                api_key=xai_key,
-                base_url="https://api.x.ai/v1",
-                models=[
-                    # Grok 4 Series (Latest)
-                    "grok-4-0709",           # Flagship model, unparalleled performance
-                    "grok-4-fast",           # Cost-efficient reasoning
-                    "grok-4-fast-reasoning", # Fast reasoning model
-                    "grok-4-fast-non-reasoning", # Fast non-reasoning variant
-                    # Grok 3 Series
-                    "grok-3",                # Generally available via API
-                    "grok-3-mini",           # Smaller, faster variant
-                    # Grok 2 Series
-                    "grok-2-1212",           # Better accuracy and multilingual
-                    "grok-2-vision-1212",    # Vision capabilities
-                    "grok-2",                # Legacy name
-                    # Specialized
-                    "grok-code-fast-1",      # Agentic coding ($0.20/1M input)
-                    # Legacy
-                    "grok-1",                # Backward compatibility
-                ],
-                cost_per_1k_tokens=0.02,  # Estimated
+                api_key=api_key,
+                base_url=base_url,
+                models=models,
+                models_set=models_set,
+                cost_per_1k_tokens=cost,
                 status=ProviderStatus.AVAILABLE
             )
             priority_counter += 1
 
-        # Perplexity
-        perplexity_key = os.getenv("PERPLEXITY_API_KEY")
-        if perplexity_key:
-            self.providers["perplexity"] = ProviderConfig(
-                name="perplexity",
-                priority=priority_counter,
-                enabled=True,
-                api_key=perplexity_key,
-                base_url="https://api.perplexity.ai",
-                models=[
-                    # Sonar Family (Proprietary - 2025)
-                    "sonar",                    # Base model (LLaMA 3.1 70B based)
-                    "sonar-pro",                # Enhanced precision and context
-                    "sonar-reasoning",          # Chain-of-Thought with live search
-                    "sonar-reasoning-pro",      # DeepSeek-R1 1776 powered
-                    "sonar-deep-research",      # Most advanced for research
-                    # Cost-Efficient Variants
-                    "sonar-small",
-                    "sonar-medium",
-                    "sonar-small-chat",
-                    "sonar-medium-chat",
-                    "sonar-small-online",       # With web search
-                    "sonar-medium-online",      # With web search
-                    # Legacy Models (Backward compatibility)
-                    "pplx-7b-online",
-                    "pplx-70b-online",
-                    "pplx-7b-chat",
-                    "pplx-70b-chat",
-                ],
-                cost_per_1k_tokens=0.005,  # Estimated
-                status=ProviderStatus.AVAILABLE
-            )
-
         logger.info(f"Initialized {len(self.providers)} providers with Ollama as priority #1")
 
-    def test_provider_availability(self):
-        """Test each provider to see if it's available"""
+    async def ready(self):
+        """Probe provider availability once; later calls return immediately"""
+        if self._probed:
+            return
+        # Concurrent callers share one probe run; a run cancelled with its loop starts over
+        if self._probe_task is None or self._probe_task.cancelled():
+            self._probe_task = asyncio.get_running_loop().create_task(self.test_provider_availability())
+        await asyncio.shield(self._probe_task)
 
-        # CRITICAL: Test Ollama FIRST and log prominently
-        if self.providers.get("ollama"):
-            try:
-                response = httpx.get(f"{self.providers['ollama'].base_url}/api/tags", timeout=5)
-                if response.status_code == 200:
-                    models = response.json().get("models", [])
-                    installed_models = [m["name"] for m in models]
+    async def test_provider_availability(self):
+        """Test each provider to see if it's available"""
+        names = list(self.providers)
+        results = await asyncio.gather(*(self._probe(name) for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Probe for {name} failed: {result}")
+        self._probed = True
 
-                    # Keep track of both potential and installed models
-                    self.providers["ollama"].models = installed_models if installed_models else self.providers["ollama"].models
-                    self.providers["ollama"].status = ProviderStatus.AVAILABLE
+        # Log initialization status
+        self.log_initialization_status()
 
-                    # Store all potential models for reference
-                    if not hasattr(self.providers["ollama"], 'all_models'):
-                        self.providers["ollama"].all_models = get_provider_models("ollama")
+    def _is_healthy(self, name: str) -> bool:
+        """Whether a provider is usable, revalidating in the background once its probe is stale
 
-                    logger.info(f"✅ OLLAMA AVAILABLE (FREE) with {len(installed_models)} installed models: {', '.join(installed_models[:5])}")
+        Never waits on the network: a stale entry is served while a fresh
+        probe runs, so per-request routing costs a dict lookup.
+        """
+        _, checked_at = self._health_cache.get(name, (None, float('-inf')))
+        if (name == "ollama" and time.monotonic() - checked_at >= HEALTH_TTL
+                and name not in self._health_tasks):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                task = loop.create_task(self._probe(name))
+                self._health_tasks[name] = task
+                task.add_done_callback(lambda _, name=name: self._health_tasks.pop(name, None))
+        return self.providers[name].status == ProviderStatus.AVAILABLE
+
+    async def _probe(self, name: str):
+        """Probe one provider; all probes run concurrently"""
+        provider = self.providers[name]
+        try:
+            await self._probe_provider(name, provider)
+        finally:
+            self._health_cache[name] = (provider.status, time.monotonic())
 
-                    # If Ollama is available, log cost savings potential
-                    if any(p.api_key for p in self.providers.values()):
-                        logger.info("💰 Using Ollama will save you money on API costs!")
-            except Exception as e:
-                self.providers["ollama"].status = ProviderStatus.ERROR
-                self.providers["ollama"].last_error = str(e)
-                logger.warning(f"⚠️ Ollama not available: {e}")
+    async def _probe_provider(self, name: str, provider: ProviderConfig):
+        """Check one provider and record what was found on its config"""
+        # CRITICAL: Test Ollama FIRST and log prominently
+        if name == "ollama":
+            # One /api/tags fetch serves both this health check and the model list
+            # request routing reads, so routing never has to refresh it
+            manager = self.ollama_manager
+            await manager.refresh_models_async()
+            # Routing and rendered reports are only invalidated when the probe changed something
+            before = (provider.status, provider.enabled, tuple(provider.models))
+
+            if manager.is_available:
+                installed_models = list(manager.available_models)
+
+                # Keep track of both potential and installed models
+                provider.models = installed_models if installed_models else provider.models
+                provider.enabled = True
+                provider.status = ProviderStatus.AVAILABLE
+
+                # Store all potential models for reference
+                if not provider.all_models:
+                    provider.all_models = get_provider_models("ollama")
+
+                logger.info(f"✅ OLLAMA AVAILABLE (FREE) with {len(installed_models)} installed models: {', '.join(installed_models[:5])}")
+
+                # If Ollama is available, log cost savings potential
+                if any(p.api_key for p in self.providers.values()):
+                    logger.info("💰 Using Ollama will save you money on API costs!")
+            else:
+                provider.enabled = False
+                provider.status = ProviderStatus.ERROR
+                provider.last_error = f"no response from {provider.base_url}/api/tags"
+                logger.warning(f"⚠️ Ollama not available at {provider.base_url}")
                 logger.warning("💡 Install Ollama from https://ollama.ai for FREE local AI")
 
-        # Test other providers
-        for name, provider in self.providers.items():
-            if name != "ollama" and provider.api_key:
-                logger.info(f"Provider {name} configured (will cost ~${provider.cost_per_1k_tokens}/1k tokens)")
+            if (provider.status, provider.enabled, tuple(provider.models)) != before:
+                self._state_version += 1
+                self._routing_version += 1
+
+        # Paid providers are never probed over the network: their health comes from
+        # real request outcomes (rate-limit windows and circuit breakers)
+        elif provider.api_key:
+            logger.info(f"Provider {name} configured (will cost ~${provider.cost_per_1k_tokens}/1k tokens)")
+
+    def _recover_rate_limited(self):
+        """Put rate-limited providers whose window has passed back into rotation"""
+        now = time.monotonic()
+        if now < self._next_rate_limit_reset:
+            return
+        next_reset = float('inf')
+        for provider in self.providers.values():
+            if provider.status != ProviderStatus.RATE_LIMITED:
+                continue
+            if now >= provider.rate_limit_reset:
+                provider.status = ProviderStatus.AVAILABLE
+                provider.rate_limit_reset = 0.0
+                self._state_version += 1
+                self._routing_version += 1
+                logger.info(f"Provider {provider.name} recovered from rate limiting")
+            else:
+                next_reset = min(next_reset, provider.rate_limit_reset)
+        self._next_rate_limit_reset = next_reset
 
     def get_available_providers(self, respect_user_preference: bool = True) -> List[ProviderConfig]:
-        """Get list of available providers with OLLAMA FIRST"""
+        """Get list of available providers with OLLAMA FIRST; the list is shared, don't modify it"""
+        self._recover_rate_limited()
+        key = (self._routing_version, self.user_preference if respect_user_preference else None)
+        cached = self._available_cache.get(respect_user_preference)
+        if cached is None or cached[0] != key:
+            cached = self._available_cache[respect_user_preference] = (
+                key, self._rank_available_providers(respect_user_preference))
+        return cached[1]
+
+    def _rank_available_providers(self, respect_user_preference: bool) -> List[ProviderConfig]:
+        """Order enabled, available providers: Ollama, then the user's preference, then priority"""
         available = [
             p for p in self.providers.values()
             if p.enabled and p.status == ProviderStatus.AVAILABLE
@@ -465,95 +630,99 @@ class OptimizedAPIManager:
 
         return available
 
+    def _ollama_family_picks(self) -> Dict[Tuple[str, str], str]:
+        """Map ('prefix'|'family', name) to the first installed model matching it"""
+        version = self.ollama_manager.state_version
+        if version != self._ollama_picks_version:
+            picks: Dict[Tuple[str, str], str] = {}
+            families = set(_OLLAMA_CODE_FAMILIES + _OLLAMA_LARGE_FAMILIES)
+            for model in self.ollama_manager.available_models:
+                for prefix in _OLLAMA_FAST_PREFIXES:
+                    if model.startswith(prefix):
+                        picks.setdefault(("prefix", prefix), model)
+                for family in families:
+                    if family in model:
+                        picks.setdefault(("family", family), model)
+            self._ollama_picks = picks
+            self._ollama_picks_version = version
+        return self._ollama_picks
+
     def _select_optimal_ollama_model(self, prompt: str) -> str:
         """Select the most appropriate Ollama model based on prompt complexity"""
         if not self.ollama_manager.available_models:
             return "llama3.2:3b"  # Default
 
         prompt_length = len(prompt)
-        prompt_lower = prompt.lower()
-
-        # Map available models to their types
-        available = set(self.ollama_manager.available_models)
+        picks = self._ollama_family_picks()
 
         # Simple/fast queries - use smallest model
         if prompt_length < 50:
-            for model in ["phi3:mini", "llama3.2:3b", "llama3.2"]:
-                if any(m.startswith(model.split(':')[0]) for m in available):
-                    return next(m for m in available if m.startswith(model.split(':')[0]))
+            for prefix in _OLLAMA_FAST_PREFIXES:
+                if ("prefix", prefix) in picks:
+                    return picks[("prefix", prefix)]
 
         # Code-related queries - use code model
-        if any(word in prompt_lower for word in ['code', 'function', 'class', 'def ', 'import', 'programming', 'script']):
-            for model in ["codellama", "qwen2.5-coder"]:
-                if any(model in m for m in available):
-                    return next(m for m in available if model in m)
+        if _CODE_PROMPT_RE.search(prompt.lower()):
+            for family in _OLLAMA_CODE_FAMILIES:
+                if ("family", family) in picks:
+                    return picks[("family", family)]
 
         # Complex/long queries - use larger model
         if prompt_length > 200:
-            for model in ["qwen2.5-coder", "llama3.2"]:
-                if any(model in m for m in available):
-                    return next(m for m in available if model in m)
+            for family in _OLLAMA_LARGE_FAMILIES:
+                if ("family", family) in picks:
+                    return picks[("family", family)]
 
         # Default to first available
-        return list(available)[0]
+        return self.ollama_manager.available_models[0]
 
     def select_provider_for_model(self, model: Optional[str]) -> Optional[ProviderConfig]:
         """Select the best provider for a specific model with Ollama priority"""
         if not model:
             return None
 
-        # Refresh Ollama models periodically
-        if self.ollama_manager.should_refresh():
-            self.ollama_manager.refresh_models()
-            # Update Ollama provider with new models
-            if "ollama" in self.providers:
-                self.providers["ollama"].models = self.ollama_manager.available_models
-
-        # Check if model is available in Ollama first (FREE)
-        if self.ollama_manager.is_model_available(model):
-            actual_model = self.ollama_manager.get_actual_model_name(model)
+        # Check if model is available in Ollama first (FREE); the model list
+        # is kept fresh by background health probes, never refreshed inline
+        if "ollama" in self.providers:
+            self._is_healthy("ollama")
+        if self.ollama_manager.is_model_available(model, refresh=False):
+            actual_model = self.ollama_manager.get_actual_model_name(model, refresh=False)
             if actual_model and "ollama" in self.providers:
                 logger.info(f"✅ Model '{model}' found in Ollama as '{actual_model}'")
                 # Store the actual model name for use
                 self._actual_model_name = actual_model
                 return self.providers["ollama"]
 
-        # Check other providers based on model name patterns
+        # A model ID a provider lists goes straight to it, whatever its name looks like
         model_lower = model.lower()
+        for provider in self.providers.values():
+            if provider.enabled and model_lower in provider.models_set:
+                return provider
 
-        # Claude models -> Anthropic
-        if "claude" in model_lower or "opus" in model_lower or "sonnet" in model_lower:
-            if "anthropic" in self.providers and self.providers["anthropic"].enabled:
-                return self.providers["anthropic"]
-
-        # GPT models -> OpenAI
-        if model_lower.startswith("gpt") or model_lower.startswith("o3") or "davinci" in model_lower:
-            if "openai" in self.providers and self.providers["openai"].enabled:
-                return self.providers["openai"]
-
-        # Gemini models -> Google
-        if "gemini" in model_lower or "bison" in model_lower:
-            if "google" in self.providers and self.providers["google"].enabled:
-                return self.providers["google"]
-
-        # Grok models -> XAI
-        if "grok" in model_lower:
-            if "xai" in self.providers and self.providers["xai"].enabled:
-                return self.providers["xai"]
-
-        # Perplexity models
-        if "pplx" in model_lower or "sonar" in model_lower:
-            if "perplexity" in self.providers and self.providers["perplexity"].enabled:
-                return self.providers["perplexity"]
+        # Otherwise route on name patterns, so IDs the tables don't list yet still work
+        for name, pattern in _MODEL_ROUTES:
+            if pattern.search(model_lower):
+                provider = self.providers.get(name)
+                if provider and provider.enabled:
+                    return provider
 
         return None
 
-    async def send_message(self, message: str, model: Optional[str] = None, **kwargs) -> Tuple[str, str]:
+    async def send_message(self, message: str, model: Optional[str] = None,
+                           priority: int = DEFAULT_PRIORITY, **kwargs) -> Tuple[str, str]:
         """
         Send message to AI provider with Ollama-first routing
         Returns: (response, provider_used)
         NEVER returns placeholder - raises exception if no API available
+        When a provider is at its concurrency limit, lower priority values go first
         """
+        await self.ready()
+        self._recover_rate_limited()
+        # Revalidate Ollama on every request, even while it is out of the ranking,
+        # so an Ollama started after the server is picked up by the default route
+        if "ollama" in self.providers:
+            self._is_healthy("ollama")
+
         # ALWAYS prioritize Ollama when no specific model is requested
         if not model or model == "auto":
             # Check if Ollama is available
@@ -566,7 +735,10 @@ class OptimizedAPIManager:
                 ollama_provider = self.providers["ollama"]
                 if ollama_provider.enabled:
                     # Ensure Ollama is marked as available
-                    ollama_provider.status = ProviderStatus.AVAILABLE
+                    if ollama_provider.status != ProviderStatus.AVAILABLE:
+                        ollama_provider.status = ProviderStatus.AVAILABLE
+                        self._state_version += 1
+                        self._routing_version += 1
                     providers = [ollama_provider]
                     # Add other providers as fallback only
                     other_providers = self.get_available_providers()
@@ -606,9 +778,19 @@ class OptimizedAPIManager:
         using_paid_fallback = False
 
         for provider in providers:
+            # Paid providers only; Ollama has no circuit
+            breaker = self._breakers.get(provider.name)
             try:
+                # Consult the health cache (revalidates stale entries in the background)
+                if not self._is_healthy(provider.name):
+                    continue
+
                 # Check rate limit
-                if provider.rate_limit_reset and datetime.now() < provider.rate_limit_reset:
+                if provider.rate_limit_reset and time.monotonic() < provider.rate_limit_reset:
+                    continue
+
+                # Skip a provider whose circuit is open
+                if breaker is not None and not breaker.allow():
                     continue
 
                 # Log which provider we're trying
@@ -619,7 +801,9 @@ class OptimizedAPIManager:
                         using_paid_fallback = True
                         logger.info(f"💸 Falling back to paid provider: {provider.name}")
 
-                response = await self._call_provider(provider, message, model, **kwargs)
+                response = await self._call_provider(provider, message, model, priority=priority, **kwargs)
+                if breaker is not None:
+                    breaker.record_success()
 
                 # Update usage stats
                 self._update_usage_stats(provider, message, response)
@@ -632,15 +816,26 @@ class OptimizedAPIManager:
 
                 return response, provider.name
 
+            except RateLimited as e:
+                # Fall back immediately; the provider is skipped until its window reopens
+                if breaker is not None:
+                    breaker.record_failure()
+                errors.append(f"{provider.name}: {str(e)}")
+                provider.last_error = str(e)
+                provider.status = ProviderStatus.RATE_LIMITED
+                provider.rate_limit_reset = time.monotonic() + e.retry_after
+                self._next_rate_limit_reset = min(self._next_rate_limit_reset, provider.rate_limit_reset)
+                self._state_version += 1
+                self._routing_version += 1
+                logger.warning(f"Provider {provider.name} rate limited: {e}")
+
             except Exception as e:
+                if breaker is not None:
+                    breaker.record_failure()
                 error_msg = f"{provider.name}: {str(e)}"
                 errors.append(error_msg)
                 provider.last_error = str(e)
-
-                # Check if rate limited (but never rate limit Ollama - it's local!)
-                if provider.name != "ollama" and ("rate" in str(e).lower() or "429" in str(e)):
-                    provider.status = ProviderStatus.RATE_LIMITED
-                    provider.rate_limit_reset = datetime.now() + timedelta(minutes=5)
+                self._state_version += 1
 
                 if not provider.fallback_on_error:
                     break
@@ -684,8 +879,8 @@ class OptimizedAPIManager:
 
     def _update_usage_stats(self, provider: ProviderConfig, message: str, response: str):
         """Update usage statistics and calculate savings"""
-        # Estimate tokens (rough approximation)
-        tokens = len(message.split()) + len(response.split())
+        # Estimate tokens: ~4 characters per token, without splitting either string
+        tokens = (len(message) + len(response)) >> 2
 
         self.usage_stats.total_requests += 1
         self.usage_stats.total_tokens += tokens
@@ -711,9 +906,18 @@ class OptimizedAPIManager:
 
         provider.usage_count += 1
         provider.tokens_used += tokens
+        self._state_version += 1
+
+    def _slot(self, name: str, priority: int):
+        """Concurrency slot for one request to a provider"""
+        slots = self._slots.get(name)
+        if slots is None:
+            limit = PROVIDER_CONCURRENCY.get(name, DEFAULT_PROVIDER_CONCURRENCY)
+            slots = self._slots[name] = _PrioritySlots(limit)
+        return slots.slot(priority)
 
     async def _call_provider(self, provider: ProviderConfig, message: str,
-                            model: Optional[str] = None, **kwargs) -> str:
+                            model: Optional[str] = None, priority: int = DEFAULT_PRIORITY, **kwargs) -> str:
         """Call specific provider's API"""
 
         if provider.name == "ollama":
@@ -733,14 +937,35 @@ class OptimizedAPIManager:
                     self._actual_model_name = None
                 else:
                     # Otherwise, try to resolve it now or use optimal selection
-                    if model and self.ollama_manager.is_model_available(model):
-                        model_to_use = self.ollama_manager.get_actual_model_name(model) or model
+                    if model and self.ollama_manager.is_model_available(model, refresh=False):
+                        model_to_use = self.ollama_manager.get_actual_model_name(model, refresh=False) or model
                     else:
                         # Auto-select optimal model based on prompt
                         model_to_use = self._select_optimal_ollama_model(message)
 
             logger.info(f"Using Ollama model: {model_to_use}")
-            return await self._call_ollama(provider, message, model_to_use, **kwargs)
+        else:
+            model_to_use = model
+
+        for attempt in range(TRANSIENT_RETRIES + 1):
+            try:
+                # Wait for a slot only after the model is resolved above: resolution consumes
+                # per-request state that another request could overwrite while this one waits
+                async with self._slot(provider.name, priority):
+                    return await self._dispatch(provider, message, model_to_use, **kwargs)
+            except _TRANSIENT_ERRORS as e:
+                if attempt == TRANSIENT_RETRIES:
+                    raise
+                # Equal jitter keeps concurrent retries from reconnecting in lockstep
+                delay = TRANSIENT_BASE_DELAY * 2 ** attempt + random.uniform(0, TRANSIENT_BASE_DELAY)
+                logger.debug(f"{provider.name} connection failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _dispatch(self, provider: ProviderConfig, message: str,
+                        model: Optional[str] = None, **kwargs) -> str:
+        """Send one request to the provider's API"""
+        if provider.name == "ollama":
+            return await self._call_ollama(provider, message, model, **kwargs)
         elif provider.name == "openai":
             return await self._call_openai(provider, message, model or "gpt-3.5-turbo", **kwargs)
         elif provider.name == "anthropic":
@@ -756,99 +981,100 @@ class OptimizedAPIManager:
 
     async def _call_ollama(self, provider: ProviderConfig, message: str, model: str, **kwargs) -> str:
         """Call Ollama API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{provider.base_url}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": message,
-                    "stream": False
-                },
-                timeout=60
-            )
-            response.raise_for_status()
-            return response.json()["response"]
+        response = await self._client.post(
+            f"{provider.base_url}/api/generate",
+            json={
+                "model": model,
+                "prompt": message,
+                "stream": False
+            }
+        )
+        response.raise_for_status()
+        return response.json()["response"]
 
     async def _call_openai(self, provider: ProviderConfig, message: str, model: str, **kwargs) -> str:
         """Call OpenAI API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{provider.base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {provider.api_key}"},
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": message}],
-                    **kwargs
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+        response = await self._client.post(
+            f"{provider.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {provider.api_key}"},
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": message}],
+                **kwargs
+            },
+            timeout=API_TIMEOUT
+        )
+        _raise_for_status(provider.name, response)
+        return response.json()["choices"][0]["message"]["content"]
 
     async def _call_anthropic(self, provider: ProviderConfig, message: str, model: str, **kwargs) -> str:
         """Call Anthropic API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{provider.base_url}/messages",
-                headers={
-                    "x-api-key": provider.api_key,
-                    "anthropic-version": "2023-06-01"
-                },
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": message}],
-                    "max_tokens": kwargs.get("max_tokens", 1000)
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()["content"][0]["text"]
+        response = await self._client.post(
+            f"{provider.base_url}/messages",
+            headers={
+                "x-api-key": provider.api_key,
+                "anthropic-version": "2023-06-01"
+            },
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": message}],
+                "max_tokens": kwargs.get("max_tokens", 1000)
+            },
+            timeout=API_TIMEOUT
+        )
+        _raise_for_status(provider.name, response)
+        return response.json()["content"][0]["text"]
 
     async def _call_google(self, provider: ProviderConfig, message: str, model: str, **kwargs) -> str:
         """Call Google Gemini API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{provider.base_url}/models/{model}:generateContent",
-                params={"key": provider.api_key},
-                json={
-                    "contents": [{"parts": [{"text": message}]}]
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+        response = await self._client.post(
+            f"{provider.base_url}/models/{model}:generateContent",
+            params={"key": provider.api_key},
+            json={
+                "contents": [{"parts": [{"text": message}]}]
+            },
+            timeout=API_TIMEOUT
+        )
+        _raise_for_status(provider.name, response)
+        return response.json()["candidates"][0]["content"]["parts"][0]["text"]
 
     async def _call_xai(self, provider: ProviderConfig, message: str, model: str, **kwargs) -> str:
         """Call XAI API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{provider.base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {provider.api_key}"},
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": message}],
-                    **kwargs
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+        response = await self._client.post(
+            f"{provider.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {provider.api_key}"},
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": message}],
+                **kwargs
+            },
+            timeout=API_TIMEOUT
+        )
+        _raise_for_status(provider.name, response)
+        return response.json()["choices"][0]["message"]["content"]
 
     async def _call_perplexity(self, provider: ProviderConfig, message: str, model: str, **kwargs) -> str:
         """Call Perplexity API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{provider.base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {provider.api_key}"},
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": message}],
-                    **kwargs
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+        response = await self._client.post(
+            f"{provider.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {provider.api_key}"},
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": message}],
+                **kwargs
+            },
+            timeout=API_TIMEOUT
+        )
+        _raise_for_status(provider.name, response)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def aclose(self):
+        """Cancel background probes and close the shared HTTP client"""
+        for task in list(self._health_tasks.values()):
+            task.cancel()
+        if "ollama_manager" in self.__dict__:  # Only if a probe has built it
+            await self.ollama_manager.aclose()
+        await self._client.aclose()
 
     def get_status_report(self) -> Dict[str, Any]:
         """Get detailed status of all providers with cost information"""
@@ -920,8 +1146,12 @@ class OptimizedAPIManager:
         """Reset a provider's error state"""
         if provider_name in self.providers:
             self.providers[provider_name].status = ProviderStatus.AVAILABLE
-            self.providers[provider_name].rate_limit_reset = None
+            self.providers[provider_name].rate_limit_reset = 0.0
             self.providers[provider_name].last_error = None
+            if provider_name in self._breakers:
+                self._breakers[provider_name] = CircuitBreaker()
+            self._state_version += 1
+            self._routing_version += 1
             logger.info(f"Reset provider {provider_name}")
 
     def log_initialization_status(self):
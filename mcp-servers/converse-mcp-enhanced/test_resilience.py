@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Test Provider Resilience - Rate limiting, circuit breaking and request slots
+Runs offline: provider HTTP traffic goes through an in-process mock transport
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import server
+from server import BreakerState, CircuitBreaker, OptimizedAPIManager, ProviderStatus
+
+
+class ManagerTestCase(unittest.IsolatedAsyncioTestCase):
+    """Builds a manager whose only provider is OpenAI, answered by self.handler"""
+
+    ollama_remote = False  # Let the manager contact Ollama, which is down until ollama_up is set
+
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        env = {
+            "OPENAI_API_KEY": "test-key",
+            "CONVERSE_DISABLE_OLLAMA_REMOTE": "" if self.ollama_remote else "1",
+            "CONVERSE_OLLAMA_CACHE_PATH": os.path.join(self._tmp.name, "ollama.json"),
+        }
+        for name in ("ANTHROPIC_API_KEY", "GEMINI_API_KEY", "XAI_API_KEY", "PERPLEXITY_API_KEY"):
+            env[name] = ""
+        self._env = patch.dict(os.environ, env)
+        self._env.start()
+
+        self.responses = []  # Queued responses for chat completions, oldest first
+        self.ollama_up = False
+        self.requests = []
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        self.manager = OptimizedAPIManager(os.path.join(self._tmp.name, "prefs.json"), client=client)
+
+    async def asyncTearDown(self):
+        await self.manager.aclose()
+        self._env.stop()
+        self._tmp.cleanup()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            if not self.ollama_up:
+                raise httpx.ConnectError("Ollama is not running", request=request)
+            return httpx.Response(200, json={"models": [{"name": "llama3.2:latest", "size": 1}]})
+        if request.url.path == "/api/generate":
+            return httpx.Response(200, json={"response": "local"})
+        self.requests.append(request.url.host)
+        if request.url.path.endswith("/chat/completions"):
+            return self.responses.pop(0)
+        return httpx.Response(200)
+
+    @staticmethod
+    def completion(text: str) -> httpx.Response:
+        return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+class TestRateLimitRecovery(ManagerTestCase):
+
+    async def test_provider_returns_after_retry_after(self):
+        """Test that a 429 benches a provider only until its Retry-After passes"""
+        self.responses = [httpx.Response(429, headers={"Retry-After": "0"}), self.completion("back")]
+
+        with self.assertRaises(RuntimeError):
+            await self.manager.send_message("hi", model="gpt-4")
+        self.assertEqual(self.manager.providers["openai"].status, ProviderStatus.RATE_LIMITED)
+
+        response, provider = await self.manager.send_message("hi", model="gpt-4")
+        self.assertEqual((response, provider), ("back", "openai"))
+        self.assertEqual(self.manager.providers["openai"].status, ProviderStatus.AVAILABLE)
+
+    async def test_provider_stays_out_during_window(self):
+        """Test that a rate-limited provider is skipped without a request until the window ends"""
+        self.responses = [httpx.Response(429, headers={"Retry-After": "120"})]
+
+        with self.assertRaises(RuntimeError):
+            await self.manager.send_message("hi", model="gpt-4")
+        calls = len(self.requests)
+        with self.assertRaises(RuntimeError):
+            await self.manager.send_message("hi", model="gpt-4")
+        self.assertEqual(len(self.requests), calls)
+
+
+class TestOllamaRecovery(ManagerTestCase):
+
+    ollama_remote = True
+
+    async def test_auto_route_picks_up_ollama_started_later(self):
+        """Test that an Ollama that was down at startup is used once it comes up"""
+        await self.manager.ready()
+        self.assertEqual(self.manager.providers["ollama"].status, ProviderStatus.ERROR)
+
+        self.ollama_up = True
+        self.responses = [self.completion("paid")]
+        with patch.object(server, "HEALTH_TTL", 0.0):
+            # Still routed to the paid provider, but the request revalidates Ollama
+            self.assertEqual(await self.manager.send_message("hi"), ("paid", "openai"))
+            for _ in range(50):
+                if self.manager.providers["ollama"].status == ProviderStatus.AVAILABLE:
+                    break
+                await asyncio.sleep(0.01)
+
+            self.assertEqual(await self.manager.send_message("hi"), ("local", "ollama"))
+
+    async def test_unchanged_probe_keeps_caches(self):
+        """Test that re-probing an Ollama whose state did not change invalidates nothing"""
+        self.ollama_up = True
+        await self.manager.ready()
+        self.assertEqual(self.manager.providers["ollama"].status, ProviderStatus.AVAILABLE)
+        version = self.manager.state_version
+        ranked = self.manager.get_available_providers()
+
+        await self.manager.test_provider_availability()
+        self.assertEqual(self.manager.state_version, version)
+        self.assertIs(self.manager.get_available_providers(), ranked)
+
+
+class TestModelRouting(ManagerTestCase):
+
+    async def test_listed_model_routes_without_pattern(self):
+        """Test that a listed model ID reaches its provider even when no name pattern matches it"""
+        self.assertEqual(self.manager.select_provider_for_model("o1-mini").name, "openai")
+
+    async def test_unlisted_model_routes_by_pattern(self):
+        """Test that model IDs missing from the tables still route on their name"""
+        self.assertEqual(self.manager.select_provider_for_model("gpt-99-preview").name, "openai")
+        self.assertIsNone(self.manager.select_provider_for_model("grok-4"))  # xAI is not configured
+
+
+class TestPaidProviderProbes(ManagerTestCase):
+
+    async def test_startup_sends_nothing_to_paid_providers(self):
+        """Test that availability checks never send requests to paid providers"""
+        await self.manager.ready()
+        self.assertEqual(self.requests, [])
+        self.assertTrue(self.manager._is_healthy("openai"))
+        await asyncio.sleep(0)
+        self.assertEqual(self.requests, [])
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self._clock = patch("server.time.monotonic", lambda: self.now)
+        self._clock.start()
+        self.addCleanup(self._clock.stop)
+        self.breaker = CircuitBreaker()
+
+    def trip(self):
+        for _ in range(server.BREAKER_FAILURE_THRESHOLD):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        """Test that consecutive failures open the circuit and block requests"""
+        for _ in range(server.BREAKER_FAILURE_THRESHOLD - 1):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, BreakerState.CLOSED)
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, BreakerState.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_allows_one_trial_after_cooldown(self):
+        """Test that one trial request goes through once the cooldown passes"""
+        self.trip()
+        self.now += server.BREAKER_COOLDOWN
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, BreakerState.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_trial_closes(self):
+        """Test that a successful trial closes the circuit and resets the count"""
+        self.trip()
+        self.now += server.BREAKER_COOLDOWN
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, BreakerState.CLOSED)
+        self.assertEqual(self.breaker.failure_count, 0)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed trial reopens the circuit for another cooldown"""
+        self.trip()
+        self.now += server.BREAKER_COOLDOWN
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, BreakerState.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_lost_trial_is_replaced_after_cooldown(self):
+        """Test that a trial that never reports back does not block the provider forever"""
+        self.trip()
+        self.now += server.BREAKER_COOLDOWN
+        self.assertTrue(self.breaker.allow())
+
+        self.now += server.BREAKER_COOLDOWN
+        self.assertTrue(self.breaker.allow())
+
+
+class TestPrioritySlots(unittest.IsolatedAsyncioTestCase):
+
+    async def queue(self, slots, priority):
+        """Start a task waiting for a slot and let it reach the queue"""
+        task = asyncio.create_task(slots.acquire(priority))
+        await asyncio.sleep(0)
+        return task
+
+    async def test_waiters_admitted_by_priority_then_fifo(self):
+        """Test that lower priority values go first, in arrival order within a priority"""
+        slots = server._PrioritySlots(1)
+        await slots.acquire(0)
+
+        admitted = []
+        tasks = {}
+        for label, priority in (("low", 5), ("high-1", 1), ("mid", 3), ("high-2", 1)):
+            tasks[label] = await self.queue(slots, priority)
+            tasks[label].add_done_callback(lambda _, label=label: admitted.append(label))
+
+        for _ in tasks:
+            slots.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks.values())
+        self.assertEqual(admitted, ["high-1", "high-2", "mid", "low"])
+
+    async def test_cancelled_waiter_is_skipped(self):
+        """Test that a waiter cancelled while queued never takes a slot"""
+        slots = server._PrioritySlots(1)
+        await slots.acquire(0)
+        first = await self.queue(slots, 0)
+        second = await self.queue(slots, 0)
+
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        slots.release()
+        await asyncio.wait_for(second, 1)
+        self.assertTrue(first.cancelled())
+
+    async def test_slot_passed_on_when_cancelled_after_handoff(self):
+        """Test that a slot handed to a waiter cancelled before it resumed goes to the next one"""
+        slots = server._PrioritySlots(1)
+        await slots.acquire(0)
+        first = await self.queue(slots, 0)
+        second = await self.queue(slots, 0)
+
+        slots.release()  # Hands the slot to first
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.wait_for(second, 1)
+
+        # second holds the only slot, so a newcomer must wait
+        third = await self.queue(slots, 0)
+        self.assertFalse(third.done())
+        slots.release()
+        await asyncio.wait_for(third, 1)
+
+    async def test_slot_released_when_holder_is_cancelled(self):
+        """Test that cancelling a task inside slot() frees its slot"""
+        slots = server._PrioritySlots(1)
+        entered = asyncio.Event()
+
+        async def hold():
+            async with slots.slot(0):
+                entered.set()
+                await asyncio.sleep(60)
+
+        holder = asyncio.create_task(hold())
+        await entered.wait()
+        holder.cancel()
+        await asyncio.gather(holder, return_exceptions=True)
+        await asyncio.wait_for(slots.acquire(0), 1)
+
+
+class TestRetryAfter(unittest.TestCase):
+
+    def test_delta_seconds(self):
+        """Test that a Retry-After in seconds is used as-is, never negative"""
+        self.assertEqual(server._parse_retry_after("120"), 120.0)
+        self.assertEqual(server._parse_retry_after("1.5"), 1.5)
+        self.assertEqual(server._parse_retry_after("-5"), 0.0)
+
+    def test_http_date(self):
+        """Test that a Retry-After HTTP-date becomes the seconds left until it"""
+        when = datetime.now(timezone.utc) + timedelta(seconds=90)
+        self.assertAlmostEqual(server._parse_retry_after(format_datetime(when, usegmt=True)), 90, delta=2)
+
+    def test_http_date_in_the_past(self):
+        """Test that a Retry-After date that already passed means retry now"""
+        self.assertEqual(server._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+    def test_missing_or_malformed_uses_default(self):
+        """Test that a missing or unparseable Retry-After falls back to the default backoff"""
+        for value in (None, "", "soon"):
+            with self.subTest(value=value):
+                self.assertEqual(server._parse_retry_after(value), server.RATE_LIMIT_BACKOFF)
+
+    def test_raise_for_status_surfaces_rate_limits(self):
+        """Test that 429 and 503 raise RateLimited carrying the parsed delay"""
+        request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+        for status in (429, 503):
+            with self.subTest(status=status):
+                response = httpx.Response(status, headers={"Retry-After": "7"}, request=request)
+                with self.assertRaises(server.RateLimited) as caught:
+                    server._raise_for_status("openai", response)
+                self.assertEqual(caught.exception.retry_after, 7.0)
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            server._raise_for_status("openai", httpx.Response(500, request=request))
+
+
+if __name__ == "__main__":
+    unittest.main()